@@ -5,7 +5,6 @@ Wrapper script to handle encoding issues when running generate_guidance.py
 
 import os
 import sys
-import subprocess
 import codecs
 import builtins
 
@@ -19,88 +18,396 @@ def _patched_open(file, mode='r', *args, **kwargs):
 
 builtins.open = _patched_open
 
-# Monkey patch the yaml module to use UTF-8 encoding
+# Monkey patch the yaml module to use UTF-8 encoding, the C parser when it is
+# built, and a cache of parsed documents. generate_guidance parses every rule
+# file on every run and for every baseline, so most loads are cache hits.
+import json
+import time
+import atexit
+import pickle
+import hashlib
+import tempfile
+
+YAML_CACHE_DIR = os.path.abspath('.yaml_cache')
+YAML_CACHE_STATS = {'hits': 0, 'misses': 0, 'saved': 0.0}
+
+# Pickled documents by absolute path: (mtime_ns, content hash, parse seconds, pickle)
+_yaml_memory_cache = {}
+
 try:
     import yaml
     _orig_yaml_load = yaml.load
+    _SAFE_LOADERS = (yaml.SafeLoader, getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    _YAML_CACHE_VERSION = f"{yaml.__version__}:{pickle.HIGHEST_PROTOCOL}".encode()
+    
+    def _parse_yaml(content, Loader):
+        if Loader in _SAFE_LOADERS:
+            Loader = _SAFE_LOADERS[1]
+        return _orig_yaml_load(content, Loader=Loader)
+    
+    def _yaml_cache_file(path):
+        return os.path.join(YAML_CACHE_DIR, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.pickle')
+    
+    def _read_yaml_cache(path, mtime_ns, digest):
+        entry = _yaml_memory_cache.get(path)
+        if entry is None:
+            try:
+                with _orig_open(_yaml_cache_file(path), 'rb') as f:
+                    entry = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                return None
+            _yaml_memory_cache[path] = entry
+        if entry[0] != mtime_ns or entry[1] != digest:
+            return None
+        return entry
+    
+    def _write_yaml_cache(path, entry):
+        _yaml_memory_cache[path] = entry
+        # Written to a temporary file and renamed, as parallel baselines share the cache
+        try:
+            os.makedirs(YAML_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=YAML_CACHE_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, _yaml_cache_file(path))
+        except OSError:
+            pass
     
     def _patched_yaml_load(stream, Loader=yaml.SafeLoader):
         if isinstance(stream, str):
-            return _orig_yaml_load(stream, Loader=Loader)
-        else:
-            content = stream.read()
-            if isinstance(content, bytes):
-                content = content.decode('utf-8')
-            return _orig_yaml_load(content, Loader=Loader)
+            return _parse_yaml(stream, Loader)
+        content = stream.read()
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        
+        # Only documents from real files and safe loaders are cached, other
+        # loaders can build arbitrary objects
+        path = getattr(stream, 'name', None)
+        if Loader not in _SAFE_LOADERS or not isinstance(path, str) or not os.path.isfile(path):
+            return _parse_yaml(content, Loader)
+        
+        started = time.perf_counter()
+        path = os.path.abspath(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        digest = hashlib.sha1(_YAML_CACHE_VERSION + content.encode('utf-8')).hexdigest()
+        entry = _read_yaml_cache(path, mtime_ns, digest)
+        if entry is not None:
+            # Unpickled on every hit so callers are free to modify what they get back
+            data = pickle.loads(entry[3])
+            YAML_CACHE_STATS['hits'] += 1
+            YAML_CACHE_STATS['saved'] += max(0.0, entry[2] - (time.perf_counter() - started))
+            return data
+        
+        data = _parse_yaml(content, Loader)
+        elapsed = time.perf_counter() - started
+        YAML_CACHE_STATS['misses'] += 1
+        _write_yaml_cache(path, (mtime_ns, digest, elapsed, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)))
+        return data
     
     yaml.load = _patched_yaml_load
 except ImportError:
     pass
 
-# Patch the generate_guidance.py script to skip the asciidoctor check
-import os
+
+def report_yaml_cache():
+    if YAML_CACHE_STATS['hits'] or YAML_CACHE_STATS['misses']:
+        print(f"YAML cache: {YAML_CACHE_STATS['hits']} hits, {YAML_CACHE_STATS['misses']} misses, "
+              f"{YAML_CACHE_STATS['saved']:.2f}s of parsing saved")
+
+# Patch generate_guidance.py to skip the asciidoctor check. The patch is applied
+# to the source in memory as the module is imported, the file on disk is untouched.
 import re
-import tempfile
-import shutil
+import runpy
+import importlib.abc
+import importlib.machinery
+import multiprocessing
 
-def patch_generate_guidance():
-    script_path = os.path.join('scripts', 'generate_guidance.py')
-    
-    # Create a temporary file
-    fd, temp_path = tempfile.mkstemp()
-    os.close(fd)
-    
+SCRIPTS_DIR = os.path.abspath('scripts')
+GUIDANCE_MODULE = 'generate_guidance'
+
+
+def patch_source(source):
+    return re.sub(
+        r'def is_asciidoctor_installed\(\):.*?return None',
+        'def is_asciidoctor_installed():\n    return "asciidoctor"',
+        source,
+        flags=re.DOTALL
+    )
+
+
+class PatchedGuidanceLoader(importlib.machinery.SourceFileLoader):
+    """Loads generate_guidance.py with the asciidoctor check patched out"""
+
+    def get_code(self, fullname):
+        # Compiled straight from the patched source, a cached .pyc would be the unpatched script
+        source = self.get_source(fullname)
+        return compile(patch_source(source), self.path, 'exec', dont_inherit=True)
+
+
+class GuidanceFinder(importlib.abc.MetaPathFinder):
+    """Finds generate_guidance in the scripts directory and loads it patched"""
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname != GUIDANCE_MODULE:
+            return None
+        script_path = os.path.join(SCRIPTS_DIR, GUIDANCE_MODULE + '.py')
+        if not os.path.exists(script_path):
+            return None
+        loader = PatchedGuidanceLoader(fullname, script_path)
+        return importlib.machinery.ModuleSpec(fullname, loader, origin=script_path)
+
+
+def install_import_hook():
+    if not any(isinstance(finder, GuidanceFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, GuidanceFinder())
+    # generate_guidance imports its neighbours from the scripts directory, as it would when run directly
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+
+
+def run_guidance(script_args):
+    """
+    Run generate_guidance.py in this process, as if it were started with
+    script_args on the command line. Returns its exit code.
+    """
+    install_import_hook()
+    sys.argv = [os.path.join(SCRIPTS_DIR, GUIDANCE_MODULE + '.py')] + script_args
+    # Put back the working directory for the caller if the script changed it
+    cwd = os.getcwd()
     try:
-        # Read the original script
-        with open(script_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Patch the is_asciidoctor_installed function
-        patched_content = re.sub(
-            r'def is_asciidoctor_installed\(\):.*?return None',
-            'def is_asciidoctor_installed():\n    return "asciidoctor"',
-            content,
-            flags=re.DOTALL
-        )
-        
-        # Write the patched content to the temporary file
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            f.write(patched_content)
-        
-        # Replace the original file with the patched one
-        shutil.copy2(temp_path, script_path)
+        runpy.run_module(GUIDANCE_MODULE, run_name='__main__', alter_sys=True)
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        # sys.exit("message") prints the message and exits 1, do the same
+        print(e.code, file=sys.stderr)
+        return 1
     finally:
-        # Clean up the temporary file
-        os.unlink(temp_path)
+        os.chdir(cwd)
+    return 0
+
+
+def run_baseline(script_args):
+    """Pool worker: run one baseline and hand its YAML cache stats back to the parent"""
+    before = dict(YAML_CACHE_STATS)
+    code = run_guidance(script_args)
+    return code, {key: YAML_CACHE_STATS[key] - before[key] for key in before}
+
+
+# Incremental builds. Each baseline's inputs and outputs are recorded per artifact
+# type in .build_manifest, and a run only regenerates the types whose inputs or
+# outputs changed since then. generate_guidance always writes the guidance, so it
+# is rebuilt along with any other type.
+MANIFEST_DIR = os.path.abspath('.build_manifest')
+
+# Inputs every artifact type depends on, relative to the repository directory
+COMMON_INPUTS = ['rules', 'custom', 'includes', 'scripts', 'VERSION.yaml']
+
+# Artifact type: (generate_guidance flag, extra inputs, outputs in build/<baseline>)
+ARTIFACTS = {
+    'guidance': (None, ['templates'], ['{name}.adoc']),
+    'profiles': ('-p', [], ['mobileconfigs']),
+    'compliance': ('-s', [], ['{name}_compliance.sh']),
+    'spreadsheet': ('-x', [], ['{name}.xls']),
+}
+ARTIFACT_FLAGS = {'-p': 'profiles', '--profiles': 'profiles', '-s': 'compliance', '--script': 'compliance',
+                  '-x': 'spreadsheet', '--xls': 'spreadsheet'}
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with _orig_open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_digest(path):
+    """Hash a file, or every file under a directory with their relative paths"""
+    if os.path.isfile(path):
+        return file_digest(path)
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8') + b'\0')
+            digest.update(file_digest(file_path).encode('ascii'))
+    return digest.hexdigest()
+
+
+# Input digests computed during this run, by path. Inputs are not expected to
+# change while the builds are planned, so each is only hashed once.
+_input_digests = {}
+
+
+def input_digest(path):
+    if path not in _input_digests:
+        _input_digests[path] = tree_digest(path)
+    return _input_digests[path]
+
+
+def split_artifact_flags(options):
+    """Separate -p/-s/-x (also combined, as in -psx) from the other generate_guidance options"""
+    types, other = [], []
+    for option in options:
+        if option in ARTIFACT_FLAGS:
+            types.append(ARTIFACT_FLAGS[option])
+        elif len(option) > 2 and option[0] == '-' and option[1] != '-' and set(option[1:]) <= set('psx'):
+            types.extend(ARTIFACT_FLAGS['-' + flag] for flag in option[1:])
+        else:
+            other.append(option)
+    return ['guidance'] + sorted(set(types), key=list(ARTIFACTS).index), other
+
+
+def manifest_path(name):
+    return os.path.join(MANIFEST_DIR, name + '.json')
+
+
+def load_manifest(name):
+    try:
+        with _orig_open(manifest_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def artifact_inputs(baseline, artifact, other_options):
+    """
+    Digest of everything an artifact type is generated from, including files
+    named in the options, such as a logo given with -l
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(other_options).encode('utf-8'))
+    option_files = [option for option in other_options if os.path.isfile(option)]
+    paths = [baseline, os.path.abspath(__file__)] + COMMON_INPUTS + ARTIFACTS[artifact][1] + option_files
+    for path in paths:
+        digest.update(f"{path}\0{input_digest(path)}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def artifact_outputs(name, artifact):
+    """Digests of an artifact type's outputs, None for any that are missing"""
+    build_dir = os.path.join('build', name)
+    outputs = {}
+    for output in ARTIFACTS[artifact][2]:
+        path = os.path.join(build_dir, output.format(name=name))
+        outputs[path] = tree_digest(path)
+    return outputs
+
+
+def plan_build(options, baseline, force):
+    """
+    Work out which artifact types of a baseline need generating. Returns the
+    generate_guidance arguments to run (None when everything is up to date),
+    and the input digests of the types being built.
+    """
+    name = os.path.splitext(os.path.basename(baseline))[0]
+    artifacts, other_options = split_artifact_flags(options)
+    manifest = load_manifest(name)
+    inputs = {artifact: artifact_inputs(baseline, artifact, other_options) for artifact in artifacts}
+    
+    stale = []
+    for artifact in artifacts:
+        entry = manifest.get(artifact, {})
+        outputs = artifact_outputs(name, artifact)
+        if force or entry.get('inputs') != inputs[artifact] or entry.get('outputs') != outputs \
+                or None in outputs.values():
+            stale.append(artifact)
+    
+    if not stale:
+        print(f"Skipping {baseline}: inputs and outputs unchanged since the last build (use --force to rebuild)")
+        return None, {}
+    
+    # The guidance comes with every run, so it is always rebuilt along with the stale types
+    build = ['guidance'] + [artifact for artifact in stale if artifact != 'guidance']
+    print(f"Building {', '.join(build)} for {baseline}")
+    flags = [ARTIFACTS[artifact][0] for artifact in build if ARTIFACTS[artifact][0]]
+    return flags + other_options + [baseline], {artifact: inputs[artifact] for artifact in build}
+
+
+def record_build(baseline, inputs):
+    """Update a baseline's manifest with the types just built and their outputs"""
+    name = os.path.splitext(os.path.basename(baseline))[0]
+    manifest = load_manifest(name)
+    for artifact, digest in inputs.items():
+        manifest[artifact] = {'inputs': digest, 'outputs': artifact_outputs(name, artifact)}
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    with _orig_open(manifest_path(name), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def split_baselines(script_args):
+    """Separate baseline YAML files from the options shared by every run"""
+    options, baselines = [], []
+    for arg in script_args:
+        if arg.lower().endswith(('.yaml', '.yml')) and os.path.isfile(arg):
+            baselines.append(arg)
+        else:
+            options.append(arg)
+    return options, baselines
+
 
 def main():
     """
-    Main function to run generate_guidance.py with UTF-8 encoding
+    Main function to run generate_guidance.py with UTF-8 encoding, once per
+    baseline given, with several baselines generated in parallel
     """
     # Get the script arguments
     script_args = sys.argv[1:]
     
     # Check if we have any arguments
     if not script_args:
-        print("Usage: python generate_wrapper.py [generate_guidance.py arguments]")
+        print("Usage: python generate_wrapper.py [--force] [generate_guidance.py options] baseline.yaml [baseline.yaml ...]")
         sys.exit(1)
     
-    # Set environment variables for Python encoding
+    # Set environment variables for Python encoding, inherited by the worker processes
     os.environ['PYTHONIOENCODING'] = 'utf-8'
     os.environ['PYTHONUTF8'] = '1'
     
-    # Patch the generate_guidance.py script
-    patch_generate_guidance()
+    atexit.register(report_yaml_cache)
     
-    # Run the generate_guidance.py script with the provided arguments
-    script_path = os.path.join('scripts', 'generate_guidance.py')
-    cmd = [sys.executable, script_path] + script_args
+    # --force is the wrapper's own option, rebuild everything regardless of the manifest
+    force = '--force' in script_args
+    script_args = [arg for arg in script_args if arg != '--force']
     
-    try:
-        result = subprocess.run(cmd, check=True)
-        sys.exit(result.returncode)
-    except subprocess.CalledProcessError as e:
-        sys.exit(e.returncode)
+    options, baselines = split_baselines(script_args)
+    if not baselines:
+        sys.exit(run_guidance(script_args))
+    
+    jobs, builds = [], []
+    for baseline in baselines:
+        job, inputs = plan_build(options, baseline, force)
+        if job is not None:
+            jobs.append(job)
+            builds.append((baseline, inputs))
+    if not jobs:
+        sys.exit(0)
+    
+    if len(jobs) == 1:
+        codes = [run_guidance(jobs[0])]
+    else:
+        # Each baseline runs in its own process, generate_guidance changes the working
+        # directory and module globals so runs cannot share an interpreter.
+        # maxtasksperchild=1 and chunksize=1 retire each worker after one baseline,
+        # so that holds with more baselines than CPUs too.
+        with multiprocessing.Pool(min(len(jobs), os.cpu_count() or 1), maxtasksperchild=1) as pool:
+            results = pool.map(run_baseline, jobs, chunksize=1)
+        codes = [code for code, _ in results]
+        for _, stats in results:
+            for key, value in stats.items():
+                YAML_CACHE_STATS[key] += value
+    
+    for (baseline, inputs), code in zip(builds, codes):
+        if code:
+            print(f"generate_guidance.py failed for {baseline} with exit code {code}")
+        else:
+            record_build(baseline, inputs)
+    sys.exit(next((code for code in codes if code), 0))
 
 if __name__ == "__main__":
     main()
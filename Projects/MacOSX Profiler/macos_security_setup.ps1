@@ -307,29 +307,32 @@ function Generate-SecurityFiles {
         $env:PYTHONUTF8 = "1"
         Write-Log "Set Python encoding environment variables to handle encoding issues."
         
-        # Process each CIS level
+        # Copy the wrapper script to the repository directory if it doesn't exist
+        if (-not (Test-Path "generate_wrapper.py")) {
+            Copy-Item -Path "../generate_wrapper.py" -Destination "generate_wrapper.py" -Force
+            Write-Log "Copied generate_wrapper.py to the repository directory."
+        }
+        
+        # Generate guidance and compliance scripts for every CIS level in one call,
+        # the wrapper builds the baselines in parallel
+        $baselinePaths = @($CisLevels.Keys | ForEach-Object { "baselines/$_" })
+        Write-Log "Generating guidance and compliance scripts for $($baselinePaths -join ', ')..."
+        
+        if ($global:PythonArgs) {
+            & $global:PythonCmd $global:PythonArgs generate_wrapper.py -p -s -x @baselinePaths
+        } else {
+            & $global:PythonCmd generate_wrapper.py -p -s -x @baselinePaths
+        }
+        if ($LASTEXITCODE -ne 0) {
+            Write-Log "generate_wrapper.py exited with code $LASTEXITCODE, checking which levels were generated." "WARNING"
+        }
+        
+        # Check each CIS level's build directory for the expected files
         foreach ($yamlFile in $CisLevels.Keys) {
             $description = $CisLevels[$yamlFile]
-            $baselinePath = "baselines/$yamlFile"
-            Write-Log "Processing $description ($yamlFile)..."
+            Write-Log "Checking $description ($yamlFile)..."
             
             try {
-                # Generate guidance and compliance scripts
-                Write-Log "Generating guidance and compliance scripts for $description..."
-                
-                # Copy the wrapper script to the repository directory if it doesn't exist
-                if (-not (Test-Path "generate_wrapper.py")) {
-                    Copy-Item -Path "../generate_wrapper.py" -Destination "generate_wrapper.py" -Force
-                    Write-Log "Copied generate_wrapper.py to the repository directory."
-                }
-                
-                if ($global:PythonArgs) {
-                    & $global:PythonCmd $global:PythonArgs generate_wrapper.py -p -s -x $baselinePath
-                } else {
-                    & $global:PythonCmd generate_wrapper.py -p -s -x $baselinePath
-                }
-                
-                # Check if the build directory exists and contains the expected files
                 $buildDir = "build/$($yamlFile -replace '\.yaml$', '')"
                 if (Test-Path $buildDir) {
                     $complianceScript = Join-Path $buildDir "$($yamlFile -replace '\.yaml$', '')_compliance.sh"
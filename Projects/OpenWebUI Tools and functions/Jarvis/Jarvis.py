@@ -5,35 +5,839 @@ author_url: https://manus.ai
 description: A tool that provides autonomous agent capabilities similar to Manus AI
 version: 0.1.0
 required_open_webui_version: 0.4.0
-requirements: requests
+requirements: requests, numpy
 licence: MIT
 """
 
 import os
+import re
 import json
+import math
+import mmap
+import time
+import heapq
+import hashlib
+import sqlite3
+import bisect
+import signal
+import asyncio
+import inspect
+import threading
+import codecs
+import fnmatch
+import functools
 import requests
+from array import array
+from html.parser import HTMLParser
+from requests.adapters import HTTPAdapter
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
 from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Union
 
+try:
+    import numpy as np
+except ImportError:  # summarize_text falls back to truncation without it
+    np = None
+
+
+# Writes to the same path are serialized on one of these, picked by the path's
+# hash, so an append never copies content another write is about to replace
+_PATH_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _path_lock(file: str) -> threading.Lock:
+    return _PATH_LOCKS[hash(os.path.realpath(file)) % len(_PATH_LOCKS)]
+
+
+class _LineIndex:
+    """
+    Sparse line index over a memory-mapped file.
+
+    For every fixed-size block of the file it stores how many newlines come
+    before the block, so the start of any line can be found by a bisect plus a
+    scan of at most one block. Blocks are only counted as far as a read needs.
+    One index is shared by every thread reading the file, so counting more
+    blocks is serialized; blocks already counted never change.
+    """
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, size: int, mtime_ns: int):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # block_lines[i] = number of newlines before byte i * BLOCK_SIZE
+        self.block_lines = array('Q', [0])
+        self._lock = threading.Lock()
+
+    def _extend(self, mm, until_newlines: Optional[int] = None):
+        with self._lock:
+            self._extend_locked(mm, until_newlines)
+
+    def _extend_locked(self, mm, until_newlines: Optional[int]):
+        while len(self.block_lines) * self.BLOCK_SIZE - self.BLOCK_SIZE < self.size:
+            if until_newlines is not None and self.block_lines[-1] >= until_newlines:
+                return
+            start = (len(self.block_lines) - 1) * self.BLOCK_SIZE
+            end = min(start + self.BLOCK_SIZE, self.size)
+            self.block_lines.append(self.block_lines[-1] + mm[start:end].count(b'\n'))
+
+    def line_offset(self, mm, line: int) -> int:
+        """Byte offset where 0-based `line` starts, or the file size past the end."""
+        if line <= 0:
+            return 0
+        self._extend(mm, line)
+        if self.block_lines[-1] < line:
+            return self.size
+        block = bisect.bisect_left(self.block_lines, line) - 1
+        pos = block * self.BLOCK_SIZE - 1
+        for _ in range(line - self.block_lines[block]):
+            pos = mm.find(b'\n', pos + 1)
+        return pos + 1
+
+    def line_count(self, mm) -> int:
+        self._extend(mm)
+        count = self.block_lines[-1]
+        if self.size and mm[self.size - 1:self.size] != b'\n':
+            count += 1
+        return count
+
+
+class _LineIndexCache:
+    """Line indexes of recently read files, dropped when the file's mtime or size changes."""
+
+    def __init__(self, max_files: int = 32):
+        self.max_files = max_files
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> _LineIndex:
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is None or index.size != stat.st_size or index.mtime_ns != stat.st_mtime_ns:
+                index = _LineIndex(stat.st_size, stat.st_mtime_ns)
+                self._indexes[path] = index
+            self._indexes.move_to_end(path)
+            while len(self._indexes) > self.max_files:
+                self._indexes.popitem(last=False)
+            return index
+
+
+class _BoundedOutput:
+    """
+    Keeps the first `head_limit` and last `tail_limit` bytes of a stream, so a
+    command printing gigabytes only ever holds a fixed amount in memory.
+    """
+
+    def __init__(self, head_limit: int, tail_limit: int):
+        self.head_limit = head_limit
+        self.tail_limit = tail_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_limit > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+
+    def render(self) -> str:
+        omitted = self.total - len(self.head) - len(self.tail)
+        text = self.head.decode('utf-8', errors='replace')
+        if omitted > 0:
+            text += f"\n... [{omitted} bytes of output omitted] ...\n"
+        return text + self.tail.decode('utf-8', errors='replace')
+
+
+class _SearchIndex:
+    """
+    Incremental BM25 inverted index over local files, persisted in SQLite.
+
+    Files are re-read only when their mtime or size changes, and re-indexed
+    only when their content hash changes as well. Posting lists are keyed by
+    term so a query reads just the rows of its own terms.
+    """
+    K1 = 1.5
+    B = 0.75
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-65536;
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+        """)
+        self._lengths = dict(self._db.execute("SELECT id, length FROM docs"))
+        self._total_length = sum(self._lengths.values())
+        self.last_refresh = 0.0
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls.TOKEN_RE.findall(text.lower())
+
+    def refresh(self, directories: List[str], extensions: set, max_file_bytes: int) -> Dict[str, int]:
+        """Bring the index in line with the files currently under `directories`."""
+        with self._lock:
+            known = {path: (doc_id, mtime_ns, size, digest) for doc_id, path, mtime_ns, size, digest
+                     in self._db.execute("SELECT id, path, mtime_ns, size, hash FROM docs")}
+            seen = set()
+            stats = {"indexed": 0, "unchanged": 0, "removed": 0}
+            with self._db:
+                for path, stat in self._walk(directories, extensions, max_file_bytes):
+                    seen.add(path)
+                    entry = known.get(path)
+                    if entry and entry[1] == stat.st_mtime_ns and entry[2] == stat.st_size:
+                        stats["unchanged"] += 1
+                        continue
+                    try:
+                        with open(path, 'rb') as f:
+                            data = f.read()
+                    except OSError:
+                        continue
+                    digest = hashlib.sha1(data).hexdigest()
+                    if entry and entry[3] == digest:
+                        self._db.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE id = ?",
+                                         (stat.st_mtime_ns, stat.st_size, entry[0]))
+                        stats["unchanged"] += 1
+                        continue
+                    if entry:
+                        self._remove(entry[0])
+                    self._add(path, stat, digest, data.decode('utf-8', errors='replace'))
+                    stats["indexed"] += 1
+                for path in known.keys() - seen:
+                    self._remove(known[path][0])
+                    stats["removed"] += 1
+            self.last_refresh = time.monotonic()
+            return stats
+
+    def _walk(self, directories: List[str], extensions: set, max_file_bytes: int):
+        stack = [os.path.realpath(d) for d in directories if os.path.isdir(d)]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith('.'):
+                            stack.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                        stat = entry.stat()
+                        if stat.st_size <= max_file_bytes:
+                            yield entry.path, stat
+                except OSError:
+                    continue
+
+    def _add(self, path: str, stat: os.stat_result, digest: str, text: str):
+        counts = Counter(self.tokenize(text))
+        length = sum(counts.values())
+        doc_id = self._db.execute(
+            "INSERT INTO docs (path, mtime_ns, size, hash, length) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_mtime_ns, stat.st_size, digest, length)).lastrowid
+        self._db.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                             ((term, doc_id, tf) for term, tf in counts.items()))
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def _remove(self, doc_id: int):
+        self._db.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self._db.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+        self._total_length -= self._lengths.pop(doc_id, 0)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Return the `limit` best BM25 matches as dicts with path and score."""
+        terms = set(self.tokenize(query))
+        with self._lock:
+            count = len(self._lengths)
+            if not terms or not count:
+                return []
+            avg_length = self._total_length / count
+            scores = {}
+            for term in terms:
+                postings = self._db.execute("SELECT doc_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings:
+                    norm = self.K1 * (1 - self.B + self.B * self._lengths.get(doc_id, 0) / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            paths = dict(self._db.execute(
+                f"SELECT id, path FROM docs WHERE id IN ({','.join('?' * len(best))})",
+                [doc_id for doc_id, _ in best])) if best else {}
+        return [{"path": paths[doc_id], "score": score} for doc_id, score in best if doc_id in paths]
+
+    @classmethod
+    def snippet(cls, path: str, query: str, width: int = 300) -> str:
+        """A short window of the file around the first query term found in it."""
+        try:
+            with open(path, 'rb') as f:
+                text = f.read(1 << 20).decode('utf-8', errors='replace')
+        except OSError:
+            return ""
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in cls.tokenize(query)]
+        positions = [p for p in positions if p >= 0]
+        start = max(0, min(positions) - width // 3) if positions else 0
+        return " ".join(text[start:start + width].split())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _TextExtractor(HTMLParser):
+    """Incremental HTML to text, fed chunk by chunk as the page downloads."""
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "section", "article", "header", "footer", "pre", "blockquote", "table", "ul", "ol"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.title = ""
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag == "title":
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+class _HttpCache:
+    """
+    On-disk cache of extracted pages with HTTP semantics.
+
+    Entries stay fresh for their max-age (or the default TTL), after which
+    they are revalidated with their ETag / Last-Modified validators. The
+    directory is kept under `max_bytes` by evicting least recently used
+    entries.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        key = self.key(url)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                os.utime(self._path(key))
+            except (OSError, ValueError):
+                self._size -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+        return entry if entry.get("url") == url else None
+
+    def put(self, url: str, entry: Dict[str, Any]):
+        key = self.key(url)
+        data = json.dumps(dict(entry, url=url)).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            while self._size > self.max_bytes and self._entries:
+                old_key, size = self._entries.popitem(last=False)
+                self._size -= size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+
+class _Summarizer:
+    """
+    Extractive summarizer: TF-IDF sentence scoring with NumPy and a
+    redundancy-aware (MMR) pick of sentences up to a character budget.
+
+    The input is streamed in batches twice, once to count document
+    frequencies and once to score sentences, keeping only the best
+    candidates. Terms are hashed into a fixed-size space, so memory stays
+    bounded whatever the input size. Batch arrays from the first pass are
+    reused by the second while they fit in CACHE_BYTES, which spares typical
+    inputs a second tokenization.
+    """
+    # ASCII letters, digits, "_" and every non-ASCII byte are word bytes
+    TRANSLATION = bytes(
+        c if (48 <= c <= 57 or 97 <= c <= 122 or c == 95 or c >= 128) else (1 if c in b".!?\n" else 32)
+        for c in range(256))
+    END_RUN_RE = re.compile(rb"\x01+")
+    HASH_BITS = 20
+    BATCH_CHARS = 1 << 20
+    CACHE_BYTES = 64 << 20
+    MIN_WORDS = 4
+    CANDIDATES = 64
+    REDUNDANCY = 0.3
+
+    def summarize(self, text: str, max_length: int) -> str:
+        size = 1 << self.HASH_BITS
+        df = np.zeros(size, dtype=np.int64)
+        collection_tf = np.zeros(size)
+        total = 0
+        cached, cached_bytes = [], 0
+        for batch in self._batches(text):
+            _, spans, owner, terms, tf = batch
+            df += np.bincount(terms, minlength=size)
+            collection_tf += np.bincount(terms, weights=tf, minlength=size)
+            total += len(spans)
+            if cached is not None:
+                cached_bytes += sum(array.nbytes for array in batch[1:])
+                cached.append(batch)
+                if cached_bytes > self.CACHE_BYTES:
+                    cached = None
+        if not df.any():
+            return text[:max_length]
+        
+        idf = np.log((1 + total) / (1 + df)) + 1.0
+        centroid = idf * collection_tf
+        centroid_norm = np.linalg.norm(centroid)
+        pool = []
+        for batch_start, spans, owner, terms, tf in (cached if cached is not None else self._batches(text)):
+            weights = tf * idf[terms]
+            dots = np.bincount(owner, weights=weights * centroid[terms], minlength=len(spans))
+            norms = np.sqrt(np.bincount(owner, weights=weights ** 2, minlength=len(spans)))
+            scores = dots / np.maximum(norms, 1e-9) / centroid_norm
+            best = np.argsort(-scores)[:self.CANDIDATES]
+            best = best[scores[best] > 0]
+            # Triples are sorted by sentence, so each sentence's terms are one slice
+            lows = np.searchsorted(owner, best, side='left')
+            highs = np.searchsorted(owner, best, side='right')
+            for sentence, low, high in zip(best, lows, highs):
+                pool.append((float(scores[sentence]), batch_start, int(spans[sentence, 0]), int(spans[sentence, 1]),
+                             terms[low:high].copy(), weights[low:high]))
+            pool = heapq.nlargest(self.CANDIDATES, pool, key=lambda candidate: candidate[0])
+        if not pool:
+            return text[:max_length]
+        
+        chosen = sorted(self._select(pool, max_length), key=lambda candidate: (candidate[1], candidate[2]))
+        summary = " ".join(self._sentence(text, candidate) for candidate in chosen)
+        return summary if len(summary) <= max_length else summary[:max_length - 3] + "..."
+
+    def _batches(self, text: str):
+        """
+        Yield (batch start, sentence spans, sentence, term, count) per batch,
+        one row of the last three per distinct term in a sentence. Spans are
+        byte offsets into the batch's UTF-8 encoding.
+        """
+        mask = (1 << self.HASH_BITS) - 1
+        boundary = hash(b"\x01")
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + self.BATCH_CHARS)
+            if end < len(text):
+                # Cut batches after a boundary so no sentence is split between two of them
+                cut = max(text.rfind(c, start, end) for c in ".!?\n")
+                if cut > start:
+                    end = cut + 1
+            data = text[start:end].encode('utf-8', errors='replace')
+            
+            # Word bytes are kept, sentence ends become \x01 and everything else a space,
+            # so a single split() tokenizes the batch with boundaries as their own tokens
+            translated = data.lower().translate(self.TRANSLATION)
+            is_end = np.frombuffer(translated, dtype=np.uint8) == 1
+            ends = np.flatnonzero(is_end[:-1] & ~is_end[1:]) + 1
+            if is_end[-1]:
+                ends = np.append(ends, len(data))
+            spans = np.column_stack((np.concatenate(([0], ends)), np.append(ends, len(data))))
+            
+            tokens = self.END_RUN_RE.sub(b" \x01 ", translated).split()
+            hashed = np.fromiter(map(hash, tokens), dtype=np.int64, count=len(tokens))
+            is_boundary = hashed == boundary
+            owner = np.cumsum(is_boundary) - is_boundary
+            owner, hashed = owner[~is_boundary], hashed[~is_boundary] & mask
+            keep = np.bincount(owner, minlength=len(spans))[owner] >= self.MIN_WORDS
+            keys, tf = np.unique(owner[keep] << self.HASH_BITS | hashed[keep], return_counts=True)
+            
+            yield (start, spans, (keys >> self.HASH_BITS).astype(np.int32),
+                   (keys & mask).astype(np.int32), tf.astype(np.int32))
+            start = end
+
+    def _sentence(self, text: str, candidate) -> str:
+        _, batch_start, begin, end = candidate[:4]
+        data = text[batch_start:batch_start + self.BATCH_CHARS].encode('utf-8', errors='replace')
+        return " ".join(data[begin:end].decode('utf-8', errors='replace').split())
+
+    def _select(self, pool, max_length: int) -> list:
+        """Greedy MMR over the candidates: relevance minus similarity to what is already picked."""
+        # Candidate vectors folded into a small dense space, cheap enough for pairwise cosine
+        vectors = np.zeros((len(pool), 4096))
+        for row, candidate in enumerate(pool):
+            np.add.at(vectors[row], candidate[4] & 4095, candidate[5])
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+        similarity = vectors @ vectors.T
+        
+        relevance = np.array([candidate[0] for candidate in pool])
+        redundancy = np.zeros(len(pool))
+        available = np.ones(len(pool), dtype=bool)
+        chosen, used = [], 0
+        while available.any():
+            mmr = np.where(available, (1 - self.REDUNDANCY) * relevance - self.REDUNDANCY * redundancy, -np.inf)
+            best = int(np.argmax(mmr))
+            available[best] = False
+            length = pool[best][3] - pool[best][2]
+            if chosen and used + length > max_length:
+                continue
+            chosen.append(pool[best])
+            used += length + 1
+            redundancy = np.maximum(redundancy, similarity[best])
+        return chosen
+
+
+class _ToolCache:
+    """
+    Memoized tool results shared across tools, keyed by tool name and
+    arguments. Each entry carries a validity token (a file's mtime and size,
+    for instance) that must match on lookup, an optional expiry for network
+    backed tools, and the paths it was derived from so a write can drop it.
+    Least recently used entries are evicted past `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._paths = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def key(tool: str, args) -> str:
+        return hashlib.sha1(json.dumps([tool, args], default=str).encode('utf-8')).hexdigest()
+
+    def _count(self, tool: str, stat: str):
+        counters = self._stats.setdefault(tool, {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0})
+        counters[stat] += 1
+
+    def get(self, tool: str, args, token=None):
+        """Return (hit, value)."""
+        key = self.key(tool, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["token"] != token or (entry["expires"] and entry["expires"] < time.monotonic()):
+                self._count(tool, "misses")
+                return False, None
+            self._entries.move_to_end(key)
+            self._count(tool, "hits")
+            return True, entry["value"]
+
+    def put(self, tool: str, args, value, token=None, ttl: Optional[float] = None, paths=()):
+        key = self.key(tool, args)
+        size = len(value) if isinstance(value, str) else len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = {"tool": tool, "value": value, "token": token, "size": size, "paths": tuple(paths),
+                                  "expires": time.monotonic() + ttl if ttl else None}
+            self._size += size
+            for path in paths:
+                self._paths.setdefault(path, set()).add(key)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._count(self._entries[oldest]["tool"], "evictions")
+                self._drop(oldest)
+
+    def invalidate_path(self, path: str):
+        """Drop every entry derived from `path`."""
+        with self._lock:
+            for key in list(self._paths.get(path, ())):
+                if key in self._entries:
+                    self._count(self._entries[key]["tool"], "invalidations")
+                self._drop(key)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry["size"]
+        for path in entry["paths"]:
+            keys = self._paths.get(path)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._paths[path]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = sum(counters["hits"] for counters in self._stats.values())
+            lookups = hits + sum(counters["misses"] for counters in self._stats.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "tools": {tool: dict(counters) for tool, counters in self._stats.items()},
+            }
+
+
+class _ToolMetrics:
+    """
+    Per-tool call counts, errors, latency histogram and payload sizes.
+
+    Recording is a handful of dict and list operations so it can wrap every
+    tool call. Only the event loop records, so no lock is needed.
+    """
+    # Upper bounds of the latency buckets in seconds, the last one catches the rest
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, float("inf"))
+
+    def __init__(self):
+        self.tools = {}
+        self.started = time.time()
+        self.last_dump = time.monotonic()
+
+    def record(self, tool: str, seconds: float, bytes_in: int, bytes_out: int, error: bool):
+        stats = self.tools.get(tool)
+        if stats is None:
+            stats = self.tools[tool] = {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                        "bytes_in": 0, "bytes_out": 0, "histogram": [0] * len(self.BUCKETS)}
+        stats["calls"] += 1
+        stats["errors"] += error
+        stats["seconds"] += seconds
+        if seconds > stats["max_seconds"]:
+            stats["max_seconds"] = seconds
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["histogram"][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        tools = {}
+        for tool, stats in self.tools.items():
+            tools[tool] = dict(stats, histogram=dict(zip((str(b) for b in self.BUCKETS), stats["histogram"])),
+                               mean_seconds=stats["seconds"] / stats["calls"])
+        return {"timestamp": time.time(), "since": self.started, "tools": tools}
+
+    async def dump(self, path: str, extra: Optional[Dict[str, Any]] = None):
+        """
+        Append a snapshot to a JSONL file. The snapshot is taken on the event
+        loop, only the file write runs in a thread.
+        """
+        self.last_dump = time.monotonic()
+        snapshot = self.snapshot()
+        if extra:
+            snapshot.update(extra)
+        await asyncio.to_thread(self._append, path, json.dumps(snapshot) + "\n")
+
+    @staticmethod
+    def _append(path: str, line: str):
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            pass
+
+
+def _payload_size(value) -> int:
+    """Rough size of a tool argument or result, only strings are counted."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(len(item) for item in value if isinstance(item, str))
+    if isinstance(value, dict):
+        return sum(len(key) + (len(item) if isinstance(item, str) else 0) for key, item in value.items())
+    return 0
+
+
+# Outcome of the tool call running in the current context. Tools return their
+# failures as text for the model to read, and mark them here through
+# _tool_failed() so callers never have to guess from the text. asyncio.to_thread
+# copies the context, so helpers running in a thread can mark it too.
+_call_outcome: ContextVar[Optional[Dict[str, bool]]] = ContextVar("jarvis_call_outcome", default=None)
+
+
+def _tool_failed(message: str) -> str:
+    """Mark the current tool call as failed and return its error message."""
+    outcome = _call_outcome.get()
+    if outcome is not None:
+        outcome["failed"] = True
+    return message
+
+
+def _instrumented(method):
+    """Record latency, payload sizes and errors of a tool method in self._metrics."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = None
+        error = True
+        parent = _call_outcome.get()
+        outcome = {"failed": False}
+        token = _call_outcome.set(outcome)
+        try:
+            result = await method(self, *args, **kwargs)
+            error = outcome["failed"]
+            return result
+        finally:
+            _call_outcome.reset(token)
+            # A caller such as an execute_plan step learns the outcome as well
+            if parent is not None and error:
+                parent["failed"] = True
+            elapsed = time.perf_counter() - started
+            bytes_out = len(result) if isinstance(result, str) else 0
+            bytes_in = 0
+            for value in args:
+                bytes_in += _payload_size(value)
+            for key, value in kwargs.items():
+                if not key.startswith("__"):
+                    bytes_in += _payload_size(value)
+            self._metrics.record(name, elapsed, bytes_in, bytes_out, error)
+            valves = self.valves
+            if valves.metrics_path and time.monotonic() - self._metrics.last_dump > valves.metrics_interval:
+                await self._metrics.dump(valves.metrics_path, {"tool_cache": self._tool_cache.stats()})
+            if valves.metrics_status and kwargs.get("__event_emitter__"):
+                await self._status(kwargs["__event_emitter__"],
+                                   f"{name}: {elapsed * 1000:.1f} ms, {bytes_in} chars in, {bytes_out} chars out"
+                                   f"{', failed' if error else ''}", done=True)
+
+    return wrapper
+
+
 class Tools:
+    # Tools a plan step may call, interactive and planning tools are left out
+    PLAN_TOOLS = {"file_read", "file_write", "file_read_many", "file_write_many", "file_search", "search_web", "execute_shell",
+                  "browse_url", "get_current_time", "summarize_text", "message_notify"}
+    PLACEHOLDER_RE = re.compile(r"\{\{\s*([\w.-]+)\s*\}\}")
+    
     def __init__(self):
         """Initialize the Manus Agent Tool."""
         self.valves = self.Valves()
         # Disable built-in citations to use our own
         self.citation = False
+        self._line_indexes = _LineIndexCache()
+        self._shell_semaphore = None
+        self._shell_concurrency = None
+        # Worker pools by name, with the size each was created for
+        self._pools = {}
+        self._search_index = None
+        self._session = None
+        self._http_cache = None
+        self._browse_stats = {"requests": 0, "hits": 0, "revalidated": 0, "seconds": 0.0}
+        self._tool_cache = _ToolCache(self.valves.tool_cache_max_bytes)
+        self._metrics = _ToolMetrics()
+        # Guards the lazily created shared resources, which worker threads may race to build
+        self._init_lock = threading.Lock()
     
     class Valves(BaseModel):
         web_search_enabled: bool = Field(True, description="Enable web search capabilities")
         file_operations_enabled: bool = Field(True, description="Enable file system operations")
         shell_operations_enabled: bool = Field(True, description="Enable shell command execution")
         browser_operations_enabled: bool = Field(True, description="Enable browser operations")
+        max_read_bytes: int = Field(200000, description="Maximum bytes returned by a single file read, longer output is truncated")
+        search_directories: str = Field("", description="Comma-separated directories indexed for search_web")
+        search_index_path: str = Field("jarvis_search_index.db", description="SQLite file the search index is persisted to")
+        search_extensions: str = Field(".txt,.md,.rst,.html,.htm,.json,.csv,.py,.log", description="Comma-separated file extensions to index")
+        search_max_file_bytes: int = Field(5000000, description="Files larger than this are not indexed")
+        search_refresh_interval: int = Field(300, description="Seconds between incremental index refreshes")
+        search_max_results: int = Field(5, description="Number of search results returned")
+        browse_cache_dir: str = Field("jarvis_browse_cache", description="Directory pages fetched by browse_url are cached in")
+        browse_cache_max_bytes: int = Field(50000000, description="Maximum size of the browse_url cache on disk")
+        browse_cache_ttl: int = Field(300, description="Seconds a page without max-age is served from cache before revalidating")
+        browse_max_bytes: int = Field(2000000, description="Maximum bytes downloaded per page")
+        browse_timeout: int = Field(20, description="Seconds before a page fetch is abandoned")
+        browse_pool_size: int = Field(10, description="Connections kept open per host")
+        file_batch_workers: int = Field(8, description="Worker threads used by file_read_many and file_write_many")
+        file_batch_max_bytes: int = Field(500000, description="Maximum combined content returned by file_read_many")
+        file_search_workers: int = Field(8, description="Worker threads used by file_search")
+        file_search_max_results: int = Field(200, description="Default number of matches file_search stops at")
+        file_search_max_file_bytes: int = Field(10000000, description="Files larger than this are skipped by file_search")
+        file_search_ignore: str = Field(".git,.hg,.svn,node_modules,__pycache__,.venv,venv,.tox,.mypy_cache,*.min.js",
+                                        description="Comma-separated file or directory name patterns file_search skips")
+        tool_cache_enabled: bool = Field(True, description="Reuse results of file_read, search_web and summarize_text for repeated calls")
+        tool_cache_max_bytes: int = Field(32000000, description="Maximum size of cached tool results")
+        tool_cache_ttl: int = Field(300, description="Seconds search_web results are reused")
+        plan_max_workers: int = Field(4, description="Plan steps execute_plan runs at the same time")
+        plan_max_steps: int = Field(50, description="Maximum number of steps in a plan")
+        plan_step_output_chars: int = Field(4000, description="Characters of each step's output included in the plan results")
+        metrics_path: str = Field("", description="JSONL file tool metrics snapshots are appended to, empty to disable")
+        metrics_interval: int = Field(60, description="Seconds between metrics snapshots")
+        metrics_status: bool = Field(False, description="Show each tool call's latency and payload size as a status line")
+        shell_timeout: int = Field(60, description="Seconds a shell command may run before it is killed")
+        shell_max_concurrency: int = Field(4, description="Maximum shell commands running at the same time")
+        shell_output_head_bytes: int = Field(16000, description="Bytes kept from the start of a command's output")
+        shell_output_tail_bytes: int = Field(16000, description="Bytes kept from the end of a command's output")
     
     class UserValves(BaseModel):
         agent_name: str = Field("Manus", description="Name of the agent")
         agent_personality: str = Field("helpful", description="Personality of the agent (helpful, creative, precise)")
     
-    def message_notify(self, text: str, attachments: Optional[List[str]] = None, __event_emitter__=None) -> str:
+    @_instrumented
+    async def message_notify(self, text: str, attachments: Optional[List[str]] = None, __event_emitter__=None) -> str:
         """
         Send a message to the user without requiring a response.
         
@@ -44,12 +848,12 @@ class Tools:
         Returns:
             Confirmation message
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "message", "data": {"text": text, "attachments": attachments or []}})
+        await self._emit(__event_emitter__, {"type": "message", "data": {"content": text, "attachments": attachments or []}})
         
         return f"Message sent: {text[:30]}..." if len(text) > 30 else f"Message sent: {text}"
     
-    def message_ask(self, text: str, attachments: Optional[List[str]] = None, suggest_user_takeover: str = "none", __event_call__=None) -> str:
+    @_instrumented
+    async def message_ask(self, text: str, attachments: Optional[List[str]] = None, suggest_user_takeover: str = "none", __event_call__=None) -> str:
         """
         Ask user a question and wait for response.
         
@@ -62,12 +866,23 @@ class Tools:
             User's response
         """
         if __event_call__:
-            response = __event_call__("ask", {"text": text, "attachments": attachments or [], "suggest_user_takeover": suggest_user_takeover})
-            return response.get("text", "No response received")
+            response = await __event_call__({
+                "type": "input",
+                "data": {
+                    "title": "Jarvis needs your input",
+                    "message": text,
+                    "placeholder": "Your answer",
+                    "attachments": attachments or [],
+                    "suggest_user_takeover": suggest_user_takeover,
+                }})
+            if isinstance(response, dict):
+                response = response.get("text") or response.get("value")
+            return response or "No response received"
         
         return "User response would be returned here"
     
-    def file_read(self, file: str, start_line: Optional[int] = None, end_line: Optional[int] = None, sudo: bool = False, __event_emitter__=None) -> str:
+    @_instrumented
+    async def file_read(self, file: str, start_line: Optional[int] = None, end_line: Optional[int] = None, sudo: bool = False, __event_emitter__=None) -> str:
         """
         Read file content.
         
@@ -80,25 +895,65 @@ class Tools:
         Returns:
             File content as text
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "status", "data": {"text": f"Reading file: {file}"}})
+        await self._status(__event_emitter__, f"Reading file: {file}")
         
         try:
-            if not os.path.exists(file):
-                return f"File not found: {file}"
-            
-            with open(file, 'r', encoding='utf-8') as f:
-                if start_line is not None or end_line is not None:
-                    lines = f.readlines()
-                    start = start_line or 0
-                    end = end_line or len(lines)
-                    return ''.join(lines[start:end])
-                else:
-                    return f.read()
+            content, cached = await asyncio.to_thread(self._read_cached, file, start_line, end_line)
+        except FileNotFoundError:
+            content, cached = _tool_failed(f"File not found: {file}"), False
         except Exception as e:
-            return f"Error reading file: {str(e)}"
+            content, cached = _tool_failed(f"Error reading file: {str(e)}"), False
+        
+        await self._status(__event_emitter__, f"Read file: {file}{' (cached)' if cached else ''}", done=True)
+        return content
+    
+    def _read_cached(self, file: str, start_line: Optional[int], end_line: Optional[int]):
+        stat = os.stat(file)
+        path = os.path.realpath(file)
+        return self._memoize("file_read", (path, start_line, end_line),
+                             lambda: self._read_lines(file, start_line, end_line),
+                             token=(stat.st_mtime_ns, stat.st_size), paths=(path,))
     
-    def file_write(self, file: str, content: str, append: bool = False, leading_newline: bool = False, trailing_newline: bool = True, sudo: bool = False, __event_emitter__=None) -> str:
+    def _read_lines(self, file: str, start_line: Optional[int], end_line: Optional[int]) -> str:
+        """
+        Read lines [start_line, end_line) through a memory map and a cached
+        line index, so paging through a large file only touches the bytes
+        being returned. Output is capped at the max_read_bytes valve.
+        """
+        path = os.path.realpath(file)
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index = self._line_indexes.get(path, stat)
+                start = start_line or 0
+                end = end_line or None
+                # Negative lines count from the end, like slicing a list of lines
+                if start < 0 or (end is not None and end < 0):
+                    total = index.line_count(mm)
+                    if start < 0:
+                        start = max(0, total + start)
+                    if end is not None and end < 0:
+                        end = max(0, total + end)
+                
+                start_offset = index.line_offset(mm, start)
+                end_offset = stat.st_size if end is None else index.line_offset(mm, end)
+                length = max(0, end_offset - start_offset)
+                limit = max(0, self.valves.max_read_bytes)
+                truncated = length > limit
+                data = mm[start_offset:start_offset + min(length, limit)]
+        
+        text = data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+        if truncated:
+            text += (
+                f"\n... [truncated: returned {limit} of {length} bytes, "
+                f"use start_line/end_line to read the rest]"
+            )
+        return text
+    
+    @_instrumented
+    async def file_write(self, file: str, content: str, append: bool = False, leading_newline: bool = False, trailing_newline: bool = True, sudo: bool = False, __event_emitter__=None) -> str:
         """
         Overwrite or append content to a file.
         
@@ -113,16 +968,20 @@ class Tools:
         Returns:
             Status message
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "status", "data": {"text": f"{'Appending to' if append else 'Writing'} file: {file}"}})
+        await self._status(__event_emitter__, f"{'Appending to' if append else 'Writing'} file: {file}")
         
+        result = await asyncio.to_thread(self._write_file, file, content, append, leading_newline, trailing_newline)
+        await self._status(__event_emitter__, result, done=True)
+        return result
+    
+    def _write_file(self, file: str, content: str, append: bool, leading_newline: bool, trailing_newline: bool) -> str:
         try:
             directory = os.path.dirname(file)
             if directory and not os.path.exists(directory):
                 os.makedirs(directory)
             
             mode = 'a' if append else 'w'
-            with open(file, mode, encoding='utf-8') as f:
+            with _path_lock(file), open(file, mode, encoding='utf-8') as f:
                 if leading_newline:
                     f.write('\n')
                 f.write(content)
@@ -131,11 +990,280 @@ class Tools:
             
             return f"Successfully {'appended to' if append else 'wrote to'} {file}"
         except Exception as e:
-            return f"Error writing to file: {str(e)}"
+            return _tool_failed(f"Error writing to file: {str(e)}")
+        finally:
+            self._tool_cache.invalidate_path(os.path.realpath(file))
+    
+    @_instrumented
+    async def file_read_many(self, files: List[str], ranges: Optional[Dict[str, List[Optional[int]]]] = None, __event_emitter__=None) -> str:
+        """
+        Read several files in one call.
+        
+        Args:
+            files: Absolute paths of the files to read
+            ranges: (Optional) Map of path to [start_line, end_line] for files that should only be read in part, 0-based with end exclusive
+            
+        Returns:
+            JSON object with a "files" list holding each file's content or error, in the order given
+        """
+        await self._status(__event_emitter__, f"Reading {len(files)} files")
+        ranges = ranges or {}
+        
+        def read(file: str):
+            start_line, end_line = (list(ranges.get(file) or []) + [None, None])[:2]
+            try:
+                content, _ = self._read_cached(file, start_line, end_line)
+                return {"file": file, "start_line": start_line, "end_line": end_line, "content": content}
+            except FileNotFoundError:
+                return {"file": file, "error": "File not found"}
+            except Exception as e:
+                return {"file": file, "error": str(e)}
+        
+        pool = self._get_pool("file_batch", self.valves.file_batch_workers)
+        results = await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(pool, read, file) for file in files))
+        
+        # The cap applies to the combined content, files past it are cut short or left empty
+        budget = self.valves.file_batch_max_bytes
+        truncated = False
+        for result in results:
+            content = result.get("content")
+            if content is None:
+                continue
+            if len(content) > budget:
+                result["content"] = content[:budget]
+                result["truncated"] = True
+                truncated = True
+            budget -= len(result["content"])
+        
+        read_count = sum(1 for result in results if "content" in result)
+        await self._status(__event_emitter__, f"Read {read_count} of {len(files)} files", done=True)
+        return json.dumps({"files": results, "truncated": truncated}, ensure_ascii=False)
     
-    def search_web(self, query: str, __event_emitter__=None) -> str:
+    @_instrumented
+    async def file_write_many(self, files: Dict[str, str], append: bool = False, trailing_newline: bool = True, __event_emitter__=None) -> str:
         """
-        Search the web for information.
+        Write several files in one call. Each file is replaced atomically, readers see the old or the new content, never part of it.
+        
+        Args:
+            files: Map of absolute file path to the text content to write
+            append: (Optional) Append to the files instead of overwriting them
+            trailing_newline: (Optional) Whether to add a trailing newline
+            
+        Returns:
+            JSON object with a "files" list holding each file's status
+        """
+        await self._status(__event_emitter__, f"{'Appending to' if append else 'Writing'} {len(files)} files")
+        
+        def write(file: str, content: str):
+            try:
+                self._write_atomic(file, content + ('\n' if trailing_newline else ''), append)
+                return {"file": file, "status": "appended" if append else "written"}
+            except Exception as e:
+                return {"file": file, "error": str(e)}
+            finally:
+                self._tool_cache.invalidate_path(os.path.realpath(file))
+        
+        pool = self._get_pool("file_batch", self.valves.file_batch_workers)
+        results = await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(pool, write, file, content)
+                                         for file, content in files.items()))
+        
+        written = sum(1 for result in results if "status" in result)
+        await self._status(__event_emitter__, f"Wrote {written} of {len(files)} files", done=True)
+        return json.dumps({"files": results}, ensure_ascii=False)
+    
+    @staticmethod
+    def _write_atomic(file: str, content: str, append: bool = False):
+        """
+        Write to a temporary file next to `file` and rename it over `file`.
+        Appends copy the current content first, writes to one path are
+        serialized within this process so concurrent appends all land.
+        Another process appending at the same time can still lose its data.
+        """
+        directory = os.path.dirname(os.path.abspath(file))
+        os.makedirs(directory, exist_ok=True)
+        with _path_lock(file):
+            Tools._replace_file(file, directory, content, append)
+
+    @staticmethod
+    def _replace_file(file: str, directory: str, content: str, append: bool):
+        try:
+            mode = os.stat(file).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = None
+        # Created 0666 so the kernel applies the umask, a new file gets the
+        # mode open() would give it
+        while True:
+            tmp_path = os.path.join(directory, f".{os.path.basename(file)}.{os.urandom(6).hex()}.tmp")
+            try:
+                descriptor = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+                break
+            except FileExistsError:
+                continue
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                if append and mode is not None:
+                    with open(file, 'rb') as existing:
+                        while True:
+                            block = existing.read(1 << 20)
+                            if not block:
+                                break
+                            f.write(block)
+                f.write(content.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            if mode is not None:
+                os.chmod(tmp_path, mode)
+            os.replace(tmp_path, file)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    
+    @_instrumented
+    async def file_search(self, pattern: str, directory: str, regex: bool = False, case_sensitive: bool = True, file_glob: Optional[str] = None, max_results: Optional[int] = None, __event_emitter__=None) -> str:
+        """
+        Search the contents of every text file under a directory, like grep -rn.
+        
+        Args:
+            pattern: Text or regular expression to look for
+            directory: Absolute path of the directory to search
+            regex: (Optional) Treat the pattern as a regular expression instead of literal text
+            case_sensitive: (Optional) Whether matching is case sensitive
+            file_glob: (Optional) Only search files whose name matches this glob, e.g. "*.py"
+            max_results: (Optional) Stop after this many matches
+            
+        Returns:
+            Matches as path:line:text, one per line
+        """
+        if not self.valves.file_operations_enabled:
+            return _tool_failed("File operations are disabled")
+        
+        await self._status(__event_emitter__, f"Searching files in {directory} for: {pattern}")
+        
+        if not os.path.isdir(directory):
+            return _tool_failed(f"Directory not found: {directory}")
+        
+        try:
+            # Files are searched whole, MULTILINE makes ^ and $ match at every line like grep
+            flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+            compiled = re.compile(pattern.encode('utf-8') if regex else re.escape(pattern.encode('utf-8')), flags)
+        except re.error as e:
+            return _tool_failed(f"Invalid regular expression: {str(e)}")
+        
+        max_results = max_results or self.valves.file_search_max_results
+        pool = self._get_pool("file_search", self.valves.file_search_workers)
+        stop = threading.Event()
+        try:
+            hits, files, truncated = await asyncio.to_thread(self._search_files, pool, stop, compiled, directory, file_glob, max_results)
+        except asyncio.CancelledError:
+            # The walk runs on in its thread, stop it queueing more directories
+            stop.set()
+            raise
+        await self._status(__event_emitter__, f"Found {len(hits)} matches in {files} files", done=True)
+        
+        if not hits:
+            return f"No matches found for: {pattern}"
+        result = "\n".join(f"{path}:{line}:{text}" for path, line, text in hits)
+        if truncated:
+            result += f"\n[Stopped after {max_results} matches]"
+        return result
+    
+    def _search_files(self, pool: ThreadPoolExecutor, stop: threading.Event, compiled: re.Pattern, directory: str,
+                      file_glob: Optional[str], max_results: int):
+        """
+        Walk `directory` and grep its files on `pool`, one task per
+        directory, stopping once `max_results` matches are found or `stop`
+        is set. Returns (hits, files searched, truncated).
+        """
+        ignore = [p.strip() for p in self.valves.file_search_ignore.split(",") if p.strip()]
+        ignored = re.compile("|".join(fnmatch.translate(p) for p in ignore)).match if ignore else lambda name: None
+        wanted = re.compile(fnmatch.translate(file_glob)).match if file_glob else lambda name: True
+        max_bytes = self.valves.file_search_max_file_bytes
+        hits = []
+        lock = threading.Lock()
+        searched = [0]
+        
+        def visit(directory: str) -> List[str]:
+            """Grep the files directly in `directory` and return its subdirectories."""
+            subdirectories, paths = [], []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if ignored(entry.name):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirectories.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False) and wanted(entry.name):
+                                paths.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                return []
+            
+            found = []
+            for path in paths:
+                if stop.is_set():
+                    break
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read(max_bytes + 1)
+                except OSError:
+                    continue
+                # A NUL byte near the start is what grep uses to call a file binary
+                if len(data) > max_bytes or b"\0" in data[:8192]:
+                    continue
+                pos, line, counted = 0, 1, 0
+                while len(found) < max_results:
+                    match = compiled.search(data, pos)
+                    if not match:
+                        break
+                    start = match.start()
+                    if start == len(data) and data.endswith(b"\n"):
+                        # An empty match after the final newline is not a line
+                        break
+                    line_start = data.rfind(b"\n", 0, start) + 1
+                    line_end = data.find(b"\n", start)
+                    if line_end < 0:
+                        line_end = len(data)
+                    # A match running past the end of its line (e.g. \s+ or [^x]*) is
+                    # not a grep match, retry within that line only
+                    if match.end() > line_end and not compiled.search(data, max(pos, line_start), line_end):
+                        pos = line_end + 1
+                        if pos > len(data):
+                            break
+                        continue
+                    line += data.count(b"\n", counted, start)
+                    counted = start
+                    found.append((path, line, data[line_start:line_end].decode('utf-8', errors='replace').strip()[:200]))
+                    # One hit per line, like grep -n
+                    pos = line_end + 1
+                    if pos > len(data):
+                        break
+            with lock:
+                searched[0] += len(paths)
+                hits.extend(found)
+                if len(hits) >= max_results:
+                    stop.set()
+            return subdirectories
+        
+        pending = {pool.submit(visit, directory)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if stop.is_set():
+                continue
+            for future in done:
+                pending.update(pool.submit(visit, subdirectory) for subdirectory in future.result())
+        
+        hits.sort(key=lambda hit: (hit[0], hit[1]))
+        return hits[:max_results], searched[0], len(hits) >= max_results
+    
+    @_instrumented
+    async def search_web(self, query: str, __event_emitter__=None) -> str:
+        """
+        Search the configured local document collections for information.
         
         Args:
             query: The search query
@@ -143,53 +1271,195 @@ class Tools:
         Returns:
             Search results as text
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "status", "data": {"text": f"Searching the web for: {query}"}})
+        await self._status(__event_emitter__, f"Searching the web for: {query}")
+        
+        if not self.valves.web_search_enabled:
+            return _tool_failed("Web search is disabled")
+        
+        directories = [d.strip() for d in self.valves.search_directories.split(",") if d.strip()]
+        if not directories:
+            return _tool_failed("No search directories configured")
         
         try:
-            # This is a simulated web search
-            # In a real implementation, you would use a search API
-            results = [
-                {"title": f"Result 1 for {query}", "snippet": "This is a simulated search result."},
-                {"title": f"Result 2 for {query}", "snippet": "Another simulated search result."},
-                {"title": f"Result 3 for {query}", "snippet": "Yet another simulated search result."}
-            ]
+            results, _ = await asyncio.to_thread(
+                self._memoize, "search_web", (query, directories, self.valves.search_max_results),
+                lambda: self._search(query, directories), ttl=self.valves.tool_cache_ttl,
+                paths=lambda hits: [os.path.realpath(hit["title"]) for hit in hits])
+            if not results:
+                return f"No results found for: {query}"
             
             formatted_results = "\n\n".join([f"## {r['title']}\n{r['snippet']}" for r in results])
             
-            if __event_emitter__:
-                for r in results:
-                    __event_emitter__({
-                        "type": "citation",
-                        "data": {
-                            "content": r["snippet"],
-                            "source": r["title"],
-                            "metadata": {"type": "web_search", "query": query}
-                        }})
+            for r in results:
+                await self._emit(__event_emitter__, {
+                    "type": "citation",
+                    "data": {
+                        "content": r["snippet"],
+                        "source": r["title"],
+                        "metadata": {"type": "web_search", "query": query, "score": round(r["score"], 3)}
+                    }})
             
+            await self._status(__event_emitter__, f"Found {len(results)} results for: {query}", done=True)
             return formatted_results
         except Exception as e:
-            return f"Error searching web: {str(e)}"
+            return _tool_failed(f"Error searching web: {str(e)}")
+    
+    def _search(self, query: str, directories: List[str]) -> List[Dict[str, Any]]:
+        index = self._get_search_index()
+        if time.monotonic() - index.last_refresh > self.valves.search_refresh_interval:
+            extensions = {e.strip().lower() for e in self.valves.search_extensions.split(",") if e.strip()}
+            index.refresh(directories, extensions, self.valves.search_max_file_bytes)
+        return [
+            {"title": hit["path"], "snippet": _SearchIndex.snippet(hit["path"], query), "score": hit["score"]}
+            for hit in index.search(query, self.valves.search_max_results)
+        ]
+    
+    def _get_search_index(self) -> _SearchIndex:
+        with self._init_lock:
+            return self._get_search_index_locked()
     
-    def execute_shell(self, command: str, working_dir: str = "/home/user", __event_emitter__=None) -> str:
+    def _get_search_index_locked(self) -> _SearchIndex:
+        if self._search_index is None or self._search_index.db_path != self.valves.search_index_path:
+            if self._search_index is not None:
+                self._search_index.close()
+            self._search_index = _SearchIndex(self.valves.search_index_path)
+        return self._search_index
+    
+    @_instrumented
+    async def execute_shell(self, command: str, working_dir: str = "/home/user", timeout: Optional[int] = None, __event_emitter__=None) -> str:
         """
         Execute a shell command.
         
         Args:
             command: Shell command to execute
             working_dir: Working directory for command execution
+            timeout: (Optional) Seconds before the command is killed, defaults to the shell_timeout valve
             
         Returns:
-            Command output
+            Command output followed by its exit code. A command that exits non-zero or times out counts as failed, which skips the steps depending on it in execute_plan
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "status", "data": {"text": f"Executing command: {command}"}})
+        if not self.valves.shell_operations_enabled:
+            return _tool_failed("Shell operations are disabled")
+        
+        await self._status(__event_emitter__, f"Executing command: {command}")
         
-        # This is a simulated shell execution
-        # In a real implementation, you would use subprocess or similar
-        return f"Simulated output of command: {command}\nExecuted in directory: {working_dir}"
+        if not os.path.isdir(working_dir):
+            return _tool_failed(f"Working directory not found: {working_dir}")
+        
+        timeout = timeout or self.valves.shell_timeout
+        output = _BoundedOutput(self.valves.shell_output_head_bytes, self.valves.shell_output_tail_bytes)
+        
+        async with self._get_shell_semaphore():
+            try:
+                process = await asyncio.create_subprocess_shell(
+                    command,
+                    cwd=working_dir,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    start_new_session=True,
+                )
+            except Exception as e:
+                return _tool_failed(f"Error executing command: {str(e)}")
+            
+            timed_out = False
+            try:
+                await asyncio.wait_for(self._stream_output(process, output, __event_emitter__), timeout)
+                await process.wait()
+            except asyncio.TimeoutError:
+                timed_out = True
+            finally:
+                if process.returncode is None:
+                    self._kill_process(process)
+                    await process.wait()
+        
+        result = output.render()
+        if timed_out:
+            result += f"\n[Command timed out after {timeout} seconds and was killed]"
+        else:
+            result += f"\n[Exit code: {process.returncode}]"
+        if timed_out or process.returncode != 0:
+            _tool_failed(result)
+        await self._status(__event_emitter__, f"Finished command: {command}", done=True)
+        return result
+    
+    async def _stream_output(self, process, output: _BoundedOutput, __event_emitter__=None):
+        """Read a process's output into `output`, echoing the latest line as a status."""
+        last_status = 0.0
+        while True:
+            chunk = await process.stdout.read(65536)
+            if not chunk:
+                return
+            output.write(chunk)
+            now = time.monotonic()
+            # Throttled, a fast printing command would otherwise flood the UI
+            if __event_emitter__ and now - last_status > 0.25:
+                last_status = now
+                lines = chunk.decode('utf-8', errors='replace').strip().splitlines()
+                if lines:
+                    await self._status(__event_emitter__, lines[-1][:200])
+    
+    def _get_pool(self, name: str, workers: int) -> ThreadPoolExecutor:
+        """
+        The instance's worker pool for `name`, kept between calls so a
+        cancelled tool call never waits on a pool shutdown. A pool whose
+        size valve changed is only dropped, a search may still be submitting
+        to it, and its threads exit once it is unused.
+        """
+        workers = max(1, workers)
+        pool, size = self._pools.get(name, (None, None))
+        if pool is None or size != workers:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"jarvis-{name}")
+            self._pools[name] = (pool, workers)
+        return pool
+    
+    def _get_shell_semaphore(self) -> asyncio.Semaphore:
+        limit = max(1, self.valves.shell_max_concurrency)
+        if self._shell_semaphore is None or self._shell_concurrency != limit:
+            self._shell_semaphore = asyncio.Semaphore(limit)
+            self._shell_concurrency = limit
+        return self._shell_semaphore
+    
+    @staticmethod
+    def _kill_process(process):
+        """Kill the command and anything it started."""
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    
+    @staticmethod
+    async def _emit(__event_emitter__, event: dict):
+        """Send an event whether the emitter is a plain function or a coroutine function."""
+        if __event_emitter__:
+            result = __event_emitter__(event)
+            if inspect.isawaitable(result):
+                await result
+    
+    def _memoize(self, tool: str, args, compute, token=None, ttl: Optional[float] = None, paths=()):
+        """
+        Return (result, cached) for a tool call, computing and storing the
+        result on a miss. `paths` may be a function of the result.
+        """
+        if not self.valves.tool_cache_enabled:
+            return compute(), False
+        if self._tool_cache.max_bytes != self.valves.tool_cache_max_bytes:
+            self._tool_cache = _ToolCache(self.valves.tool_cache_max_bytes)
+        hit, value = self._tool_cache.get(tool, args, token)
+        if hit:
+            return value, True
+        value = compute()
+        self._tool_cache.put(tool, args, value, token=token, ttl=ttl, paths=paths(value) if callable(paths) else paths)
+        return value, False
     
-    def browse_url(self, url: str, __event_emitter__=None) -> str:
+    async def _status(self, __event_emitter__, description: str, done: bool = False):
+        await self._emit(__event_emitter__, {"type": "status", "data": {"description": description, "done": done}})
+    
+    @_instrumented
+    async def browse_url(self, url: str, __event_emitter__=None) -> str:
         """
         Browse to a URL and extract content.
         
@@ -199,14 +1469,138 @@ class Tools:
         Returns:
             Page content
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "status", "data": {"text": f"Browsing URL: {url}"}})
+        await self._status(__event_emitter__, f"Browsing URL: {url}")
+        
+        if not self.valves.browser_operations_enabled:
+            return _tool_failed("Browser operations are disabled")
+        
+        started = time.perf_counter()
+        # Not memoized, the HTTP cache already reuses pages for as long as their
+        # Cache-Control allows and revalidates them after that
+        try:
+            text, source = await asyncio.to_thread(self._fetch_page, url)
+        except Exception as e:
+            return _tool_failed(f"Error browsing URL: {str(e)}")
+        elapsed = time.perf_counter() - started
+        
+        stats = self._browse_stats
+        stats["requests"] += 1
+        stats["seconds"] += elapsed
+        if source == "cache":
+            stats["hits"] += 1
+        elif source == "revalidated":
+            stats["revalidated"] += 1
+        hit_ratio = (stats["hits"] + stats["revalidated"]) / stats["requests"]
+        
+        await self._status(__event_emitter__,
+                           f"Fetched {url} ({source}, {elapsed * 1000:.0f} ms, cache hit ratio {hit_ratio:.0%})", done=True)
+        return text
+    
+    def _fetch_page(self, url: str):
+        """Return the page text and where it came from: cache, revalidated or network."""
+        cache = self._get_http_cache()
+        entry = cache.get(url)
+        if entry and entry["expires"] > time.time():
+            return entry["text"], "cache"
+        
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        
+        with self._get_session().get(url, headers=headers, stream=True, timeout=self.valves.browse_timeout) as response:
+            if response.status_code == 304 and entry:
+                entry["expires"] = time.time() + self._max_age(response, entry.get("max_age"))
+                cache.put(url, entry)
+                return entry["text"], "revalidated"
+            response.raise_for_status()
+            text = self._extract_text(response)
+            cache_control = response.headers.get("Cache-Control", "").lower()
+            if "no-store" not in cache_control:
+                max_age = self._max_age(response)
+                cache.put(url, {
+                    "text": text,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    # no-cache means "always revalidate"
+                    "expires": time.time() + (0 if "no-cache" in cache_control else max_age),
+                    "max_age": max_age,
+                })
+        return text, "network"
+    
+    def _max_age(self, response, default: Optional[int] = None) -> int:
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        if match:
+            return int(match.group(1))
+        return default if default is not None else self.valves.browse_cache_ttl
+    
+    def _extract_text(self, response) -> str:
+        """Stream the body, decoding and parsing as it arrives, up to browse_max_bytes."""
+        content_type = response.headers.get("Content-Type", "").lower()
+        is_html = "html" in content_type
+        if content_type and not is_html and not content_type.startswith("text/") and "json" not in content_type and "xml" not in content_type:
+            return f"Unsupported content type: {content_type}"
+        
+        # requests falls back to ISO-8859-1 for text/* without a charset, most pages are UTF-8
+        encoding = response.encoding if "charset" in content_type else "utf-8"
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors='replace')
+        parser = _TextExtractor() if is_html else None
+        parts = []
+        received = 0
+        truncated = False
+        for chunk in response.iter_content(chunk_size=65536):
+            chunk = chunk[:self.valves.browse_max_bytes - received]
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            if parser:
+                parser.feed(text)
+            else:
+                parts.append(text)
+            if received >= self.valves.browse_max_bytes:
+                truncated = True
+                break
         
-        # This is a simulated browser operation
-        # In a real implementation, you would use a browser automation library
-        return f"Simulated content from URL: {url}\n\nThis would contain the extracted text from the webpage."
+        if parser:
+            parser.close()
+            body = parser.text()
+            if parser.title.strip():
+                body = f"# {' '.join(parser.title.split())}\n\n{body}"
+        else:
+            body = "".join(parts) + decoder.decode(b"", final=True)
+        if truncated:
+            body += f"\n\n[Page truncated after {self.valves.browse_max_bytes} bytes]"
+        return body
+    
+    def _get_session(self) -> requests.Session:
+        with self._init_lock:
+            return self._get_session_locked()
+    
+    def _get_session_locked(self) -> requests.Session:
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.valves.browse_pool_size, pool_maxsize=self.valves.browse_pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "Mozilla/5.0 (compatible; Jarvis/0.1)"
+            self._session = session
+        return self._session
+    
+    def _get_http_cache(self) -> _HttpCache:
+        with self._init_lock:
+            return self._get_http_cache_locked()
+    
+    def _get_http_cache_locked(self) -> _HttpCache:
+        if (self._http_cache is None or self._http_cache.directory != self.valves.browse_cache_dir
+                or self._http_cache.max_bytes != self.valves.browse_cache_max_bytes):
+            self._http_cache = _HttpCache(self.valves.browse_cache_dir, self.valves.browse_cache_max_bytes)
+        return self._http_cache
     
-    def get_current_time(self) -> str:
+    @_instrumented
+    async def get_current_time(self) -> str:
         """
         Get the current date and time.
         
@@ -216,7 +1610,8 @@ class Tools:
         now = datetime.now()
         return now.strftime("%Y-%m-%d %H:%M:%S")
     
-    def generate_plan(self, task: str, __user__=None, __event_emitter__=None) -> str:
+    @_instrumented
+    async def generate_plan(self, task: str, __user__=None, __event_emitter__=None) -> str:
         """
         Generate a step-by-step plan for completing a task.
         
@@ -226,8 +1621,7 @@ class Tools:
         Returns:
             Step-by-step plan
         """
-        if __event_emitter__:
-            __event_emitter__({"type": "status", "data": {"text": f"Generating plan for: {task}"}})
+        await self._status(__event_emitter__, f"Generating plan for: {task}")
         
         agent_name = "Manus"
         if __user__ and "valves" in __user__ and hasattr(__user__["valves"], "agent_name"):
@@ -235,15 +1629,157 @@ class Tools:
         
         steps = [
             f"1. Analyze the task: '{task}'",
-            "2. Break down the task into manageable steps",
-            "3. Execute each step methodically",
+            "2. Break the task down into tool calls and note which calls need another call's output",
+            "3. Write those calls as a plan graph (format below) and run it with execute_plan, "
+            "independent calls run at the same time",
             "4. Verify results and make adjustments as needed",
             "5. Deliver final results to the user"
         ]
+        tools = ", ".join(sorted(self.PLAN_TOOLS))
+        plan_format = (
+            "Plan graph format for execute_plan, a JSON list of steps:\n"
+            '[{"id": "notes", "tool": "file_read", "args": {"file": "/data/notes.md"}},\n'
+            ' {"id": "search", "tool": "search_web", "args": {"query": "reactor cooling"}},\n'
+            ' {"id": "summary", "tool": "summarize_text", "args": {"text": "{{notes}}\\n{{search}}"}, '
+            '"depends_on": ["notes", "search"]}]\n'
+            "\"{{id}}\" in an argument is replaced by that step's output and makes the step wait for it. "
+            f"Available tools: {tools}."
+        )
+        
+        await self._status(__event_emitter__, f"Generated plan for: {task}", done=True)
+        return f"# {agent_name}'s Plan for: {task}\n\n" + "\n".join(steps) + "\n\n" + plan_format
+    
+    @_instrumented
+    async def execute_plan(self, plan: str, __event_emitter__=None) -> str:
+        """
+        Run a plan graph of tool calls, running steps whose inputs are ready at the same time.
+        
+        Args:
+            plan: JSON list of steps, each {"id": ..., "tool": ..., "args": {...}, "depends_on": [...]}; "{{id}}" inside an argument is replaced by that step's output
+            
+        Returns:
+            Output of every step
+        """
+        try:
+            steps, order = self._parse_plan(plan)
+        except ValueError as e:
+            return _tool_failed(f"Invalid plan: {str(e)}")
+        
+        await self._status(__event_emitter__, f"Executing plan with {len(steps)} steps")
+        semaphore = asyncio.Semaphore(max(1, self.valves.plan_max_workers))
+        outputs, states, timings = {}, {}, {}
+        tasks = {}
+        
+        async def run(step_id: str) -> bool:
+            step = steps[step_id]
+            ready = await asyncio.gather(*(tasks[dependency] for dependency in step["depends_on"]))
+            if not all(ready):
+                states[step_id] = "skipped"
+                return False
+            args = {name: self._fill_placeholders(value, outputs) for name, value in step["args"].items()}
+            method = getattr(self, step["tool"])
+            if "__event_emitter__" in inspect.signature(method).parameters:
+                args["__event_emitter__"] = __event_emitter__
+            async with semaphore:
+                started = time.perf_counter()
+                # Set in this step's own task context, the tool marks it when it fails
+                outcome = {"failed": False}
+                _call_outcome.set(outcome)
+                try:
+                    outputs[step_id] = str(await method(**args))
+                    states[step_id] = "failed" if outcome["failed"] else "done"
+                except Exception as e:
+                    outputs[step_id] = f"Error: {str(e)}"
+                    states[step_id] = "failed"
+                timings[step_id] = time.perf_counter() - started
+            finished = sum(1 for state in states.values() if state in ("done", "failed"))
+            await self._status(__event_emitter__, f"Step {step_id} ({step['tool']}) {states[step_id]} [{finished}/{len(steps)}]")
+            return states[step_id] == "done"
+        
+        started = time.perf_counter()
+        # Created in topological order, so every dependency's task exists when its dependents start
+        for step_id in order:
+            tasks[step_id] = asyncio.create_task(run(step_id))
+        await asyncio.gather(*tasks.values())
+        elapsed = time.perf_counter() - started
+        
+        await self._status(__event_emitter__,
+                           f"Executed plan: {len(steps)} steps in {elapsed:.1f}s ({sum(timings.values()):.1f}s of step time)", done=True)
+        limit = self.valves.plan_step_output_chars
+        sections = []
+        for step_id in steps:
+            output = outputs.get(step_id, "Not run, a step it depends on did not succeed")
+            if len(output) > limit:
+                output = output[:limit] + f"\n[Output truncated, {len(output)} characters in total]"
+            timing = f", {timings[step_id]:.2f}s" if step_id in timings else ""
+            sections.append(f"## {step_id}: {steps[step_id]['tool']} ({states[step_id]}{timing})\n{output}")
+        return f"# Plan results ({elapsed:.1f}s)\n\n" + "\n\n".join(sections)
+    
+    def _parse_plan(self, plan: str):
+        """Validate a plan and return its steps by id plus a topological order."""
+        try:
+            raw_steps = json.loads(plan)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"not valid JSON ({str(e)})")
+        if isinstance(raw_steps, dict):
+            raw_steps = raw_steps.get("steps", [])
+        if not isinstance(raw_steps, list) or not raw_steps:
+            raise ValueError("expected a non-empty list of steps")
+        if len(raw_steps) > self.valves.plan_max_steps:
+            raise ValueError(f"more than {self.valves.plan_max_steps} steps")
         
-        return f"# {agent_name}'s Plan for: {task}\n\n" + "\n".join(steps)
+        steps = {}
+        for number, raw in enumerate(raw_steps):
+            if not isinstance(raw, dict):
+                raise ValueError(f"step {number} is not an object")
+            step_id = str(raw.get("id", number))
+            tool = raw.get("tool")
+            args = raw.get("args") or {}
+            if step_id in steps:
+                raise ValueError(f"duplicate step id {step_id}")
+            if tool not in self.PLAN_TOOLS:
+                raise ValueError(f"step {step_id} uses unknown tool {tool}")
+            if not isinstance(args, dict):
+                raise ValueError(f"step {step_id} args must be an object")
+            try:
+                inspect.signature(getattr(self, tool)).bind(**args)
+            except TypeError as e:
+                raise ValueError(f"step {step_id} has bad arguments for {tool} ({str(e)})")
+            steps[step_id] = {"tool": tool, "args": args, "depends_on": set(str(d) for d in raw.get("depends_on") or [])}
+        # Referring to a step's output is an implicit dependency, other {{...}} text is left alone
+        for step in steps.values():
+            step["depends_on"].update(set(self.PLACEHOLDER_RE.findall(json.dumps(step["args"]))) & steps.keys())
+        
+        waiting = {step_id: set(step["depends_on"]) for step_id, step in steps.items()}
+        for step_id, dependencies in waiting.items():
+            unknown = dependencies - steps.keys()
+            if unknown:
+                raise ValueError(f"step {step_id} depends on unknown steps {', '.join(sorted(unknown))}")
+        order = []
+        ready = [step_id for step_id, dependencies in waiting.items() if not dependencies]
+        while ready:
+            step_id = ready.pop()
+            order.append(step_id)
+            for other, dependencies in waiting.items():
+                if step_id in dependencies:
+                    dependencies.discard(step_id)
+                    if not dependencies:
+                        ready.append(other)
+        if len(order) != len(steps):
+            raise ValueError("steps depend on each other in a cycle")
+        return steps, order
+    
+    def _fill_placeholders(self, value, outputs: Dict[str, str]):
+        if isinstance(value, str):
+            return self.PLACEHOLDER_RE.sub(lambda match: outputs.get(match.group(1), match.group(0)), value)
+        if isinstance(value, list):
+            return [self._fill_placeholders(item, outputs) for item in value]
+        if isinstance(value, dict):
+            return {key: self._fill_placeholders(item, outputs) for key, item in value.items()}
+        return value
     
-    def summarize_text(self, text: str, max_length: int = 500) -> str:
+    @_instrumented
+    async def summarize_text(self, text: str, max_length: int = 500) -> str:
         """
         Summarize a long text.
         
@@ -254,8 +1790,17 @@ class Tools:
         Returns:
             Summarized text
         """
-        # This is a simulated text summarization
-        # In a real implementation, you would use an NLP library or API
+        summary, _ = await asyncio.to_thread(
+            self._memoize, "summarize_text", (hashlib.sha1(text.encode('utf-8', errors='replace')).hexdigest(), max_length),
+            lambda: self._summarize(text, max_length))
+        return summary
+    
+    def _summarize(self, text: str, max_length: int) -> str:
+        if len(text) <= max_length:
+            return text
+        if np is not None:
+            return _Summarizer().summarize(text, max_length)
+        
         words = text.split()
         if len(words) <= max_length / 5:  # Assuming average word length of 5
             return text
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Jarvis file_search tool over a large synthetic tree.
+
+Builds a tree of source-like text files (plus some binaries and an ignored
+node_modules directory) and times three ways of finding a rare needle:
+
+    file_read loop      one file_read() call per file, what an agent did
+                        before file_search existed (minus the model round trips)
+    file_search xN      one file_search() call with N worker threads
+
+and one file_search() for a common word capped by max_results, which shows
+the early stop.
+
+Needs pydantic and requests, but not OpenWebUI itself.
+
+Usage:
+    python bench_file_search.py --files 20000 --workers 1,4,8,16
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+from time import perf_counter
+
+from bench_tools import load_jarvis
+
+WORDS = ["def", "return", "self", "value", "config", "request", "handler", "result", "index", "buffer",
+         "import", "class", "error", "status", "client", "server", "cache", "token", "stream", "event"]
+
+
+def make_tree(root: str, files: int, lines_per_file: int):
+    random.seed(0)
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i % 50}", f"mod{i % 7}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i}.py"), "w") as f:
+            for n in range(lines_per_file):
+                f.write("    " + " ".join(random.choices(WORDS, k=8)) + f"  # {n}\n")
+            if i == files - 1:
+                f.write("NEEDLE_7f3a = 1\n")
+        if i % 100 == 0:
+            with open(os.path.join(directory, f"blob{i}.bin"), "wb") as f:
+                f.write(os.urandom(1 << 16) + b"\0NEEDLE_7f3a")
+    ignored = os.path.join(root, "node_modules", "dep")
+    os.makedirs(ignored)
+    for i in range(200):
+        with open(os.path.join(ignored, f"dep{i}.js"), "w") as f:
+            f.write("NEEDLE_7f3a\n" * 100)
+
+
+async def timed(coroutine):
+    started = perf_counter()
+    result = await coroutine
+    return perf_counter() - started, result
+
+
+async def read_loop(tools, root: str):
+    hits = 0
+    for directory, dirs, names in os.walk(root):
+        for name in names:
+            content = await tools.file_read(os.path.join(directory, name))
+            hits += "NEEDLE_7f3a" in content
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000, help="text files in the tree")
+    parser.add_argument("--lines", type=int, default=100, help="lines per file")
+    parser.add_argument("--workers", default="1,4,8,16", help="comma-separated worker counts to try")
+    args = parser.parse_args()
+
+    jarvis = load_jarvis()
+    root = tempfile.mkdtemp(prefix="jarvis-search-bench-")
+    try:
+        make_tree(root, args.files, args.lines)
+        tools = jarvis.Tools()
+        size = sum(os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(root) for n in names)
+        print(f"{args.files} files, {size / (1 << 20):.0f} MB\n")
+        print(f"{'run':<28} {'seconds':>8} {'matches':>8}")
+
+        elapsed, hits = asyncio.run(timed(read_loop(tools, root)))
+        print(f"{'file_read loop':<28} {elapsed:>8.2f} {hits:>8}")
+
+        for workers in (int(w) for w in args.workers.split(",")):
+            tools.valves.file_search_workers = workers
+            elapsed, result = asyncio.run(timed(tools.file_search("NEEDLE_7f3a", root)))
+            print(f"{f'file_search x{workers}':<28} {elapsed:>8.2f} {result.count(chr(10)) + 1:>8}")
+
+        elapsed, result = asyncio.run(timed(tools.file_search("handler", root, max_results=50)))
+        print(f"{'file_search common, max 50':<28} {elapsed:>8.2f} {result.count(chr(10)):>8}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
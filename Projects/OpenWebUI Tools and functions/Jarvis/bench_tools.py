@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Event-loop responsiveness benchmark for the Jarvis tools.
+
+Runs a batch of concurrent tool calls (file_read of 2000-line windows of a
+large log, 220 KB file_write, search_web) in a scratch workspace while a probe
+coroutine ticks on the same loop, and reports how late the probe's ticks
+were. It does this twice:
+
+    blocking    the tools' blocking helpers called straight on the loop,
+                which is what the synchronous tool methods used to do
+    async       the async tool methods, which offload that work to threads
+
+A late tick is time every other chat on the same OpenWebUI worker spends
+frozen, so the async run should keep the lag near the probe interval.
+
+Needs pydantic and requests, but not OpenWebUI itself.
+
+Usage:
+    python bench_tools.py --calls 120 --file-mb 50
+"""
+
+import argparse
+import asyncio
+import functools
+import importlib.util
+import os
+import random
+import shutil
+import statistics
+import tempfile
+from time import perf_counter
+
+CONTENT = "generated report line\n" * 10000
+
+JARVIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Jarvis.py")
+
+
+def load_jarvis():
+    spec = importlib.util.spec_from_file_location("jarvis", JARVIS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_workspace(root: str, file_mb: int, documents: int) -> str:
+    big_file = os.path.join(root, "big.log")
+    line = "2024-01-01 12:00:00 INFO worker-3 processed request id=%d in 12ms\n"
+    with open(big_file, "w") as f:
+        written, i = 0, 0
+        while written < file_mb << 20:
+            text = line % i
+            f.write(text)
+            written += len(text)
+            i += 1
+
+    corpus = os.path.join(root, "docs")
+    os.makedirs(corpus)
+    words = [f"term{i}" for i in range(5000)]
+    random.seed(0)
+    for i in range(documents):
+        with open(os.path.join(corpus, f"{i}.txt"), "w") as f:
+            f.write(" ".join(random.choices(words, k=300)))
+    return big_file
+
+
+async def probe(interval: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(perf_counter() - started - interval)
+
+
+async def run(tools, calls, interval: float):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(interval, lags, stop))
+    await asyncio.sleep(interval * 5)
+    started = perf_counter()
+    await asyncio.gather(*(call() for call in calls))
+    elapsed = perf_counter() - started
+    stop.set()
+    await probe_task
+    return elapsed, lags
+
+
+def blocking_calls(tools, big_file: str, scratch: str, docs: str, count: int):
+    async def read():
+        start = random.randrange(100000)
+        tools._read_lines(big_file, start, start + 2000)
+
+    async def write(i=0):
+        tools._write_file(os.path.join(scratch, f"out{i}.txt"), CONTENT, False, False, True)
+
+    async def search():
+        tools._search("term1 term42 term4999", [docs])
+
+    kinds = [read, write, search]
+    return [functools.partial(write, i) if kinds[i % 3] is write else kinds[i % 3] for i in range(count)]
+
+
+def async_calls(tools, big_file: str, scratch: str, docs: str, count: int):
+    async def read():
+        start = random.randrange(100000)
+        await tools.file_read(big_file, start, start + 2000)
+
+    async def write(i=0):
+        await tools.file_write(os.path.join(scratch, f"out{i}.txt"), CONTENT)
+
+    async def search():
+        await tools.search_web("term1 term42 term4999")
+
+    kinds = [read, write, search]
+    return [functools.partial(write, i) if kinds[i % 3] is write else kinds[i % 3] for i in range(count)]
+
+
+def report(name: str, elapsed: float, lags: list):
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(0.99 * len(lags_ms)))]
+    print(
+        f"{name:<10} {elapsed:>8.2f} {len(lags):>7} {statistics.median(lags_ms):>9.2f} "
+        f"{p99:>9.2f} {lags_ms[-1]:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=120, help="concurrent tool calls per run")
+    parser.add_argument("--file-mb", type=int, default=50, help="size of the file read by file_read")
+    parser.add_argument("--documents", type=int, default=2000, help="documents in the search corpus")
+    parser.add_argument("--interval", type=float, default=0.005, help="probe tick interval in seconds")
+    args = parser.parse_args()
+
+    jarvis = load_jarvis()
+    root = tempfile.mkdtemp(prefix="jarvis-bench-")
+    try:
+        big_file = make_workspace(root, args.file_mb, args.documents)
+        docs = os.path.join(root, "docs")
+        scratch = os.path.join(root, "scratch")
+
+        tools = jarvis.Tools()
+        tools.valves.search_directories = docs
+        tools.valves.search_index_path = os.path.join(root, "index.db")
+        # Build the index up front so both runs measure queries, not the first build
+        tools._search("warmup", [docs])
+
+        print(f"{args.calls} calls, {args.file_mb} MB file, {args.documents} documents, "
+              f"probe every {args.interval * 1000:.0f} ms\n")
+        print(f"{'mode':<10} {'wall s':>8} {'ticks':>7} {'lag p50':>9} {'lag p99':>9} {'lag max':>9}")
+        for name, make_calls in (("blocking", blocking_calls), ("async", async_calls)):
+            calls = make_calls(tools, big_file, scratch, docs, args.calls)
+            elapsed, lags = asyncio.run(run(tools, calls, args.interval))
+            report(name, elapsed, lags)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
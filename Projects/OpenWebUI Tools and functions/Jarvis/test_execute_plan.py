@@ -0,0 +1,107 @@
+"""
+Tests for how the Jarvis tools report failures to execute_plan and the tool
+metrics, including results that only look like errors.
+
+Linux only, some steps run /bin/sh commands. Needs pydantic and requests, but
+not OpenWebUI itself.
+
+Usage:
+    python -m pytest test_execute_plan.py
+    python -m unittest test_execute_plan
+"""
+
+import importlib.util
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+JARVIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Jarvis.py")
+
+
+def load_jarvis():
+    spec = importlib.util.spec_from_file_location("jarvis", JARVIS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+jarvis = load_jarvis()
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "runs Linux shell commands")
+class ExecutePlanFailureTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tools = jarvis.Tools()
+        self.tools.valves.tool_cache_enabled = False
+        self.workdir = tempfile.mkdtemp(prefix="jarvis-plan-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.workdir, name)
+
+    async def run_plan(self, steps: list) -> dict:
+        """Run a plan and return each step's state by id."""
+        result = await self.tools.execute_plan(json.dumps(steps))
+        return dict(re.findall(r"^## ([\w-]+): \w+ \((\w+)", result, re.MULTILINE))
+
+    def errors(self, tool: str) -> int:
+        return self.tools._metrics.snapshot()["tools"][tool]["errors"]
+
+    async def test_content_that_looks_like_an_error_succeeds(self):
+        with open(self.path("budget.txt"), "w") as f:
+            f.write("Error budget for Q3 is fine\nInvalid entries: none\n")
+        states = await self.run_plan([
+            {"id": "read", "tool": "file_read", "args": {"file": self.path("budget.txt")}},
+            {"id": "summary", "tool": "summarize_text", "args": {"text": "{{read}}"}},
+            {"id": "echo", "tool": "execute_shell",
+             "args": {"command": "echo Invalid option ignored; true", "working_dir": self.workdir}},
+            {"id": "notify", "tool": "message_notify", "args": {"text": "{{echo}}"}},
+        ])
+        self.assertEqual(states, {"read": "done", "summary": "done", "echo": "done", "notify": "done"})
+        self.assertEqual(self.errors("file_read"), 0)
+        self.assertEqual(self.errors("execute_shell"), 0)
+
+    async def test_failed_step_skips_dependents(self):
+        states = await self.run_plan([
+            {"id": "read", "tool": "file_read", "args": {"file": self.path("missing.txt")}},
+            {"id": "summary", "tool": "summarize_text", "args": {"text": "{{read}}"}},
+            {"id": "search", "tool": "file_search", "args": {"pattern": "x", "directory": self.path("none")}},
+            {"id": "after-search", "tool": "message_notify", "args": {"text": "{{search}}"}, "depends_on": ["search"]},
+            {"id": "independent", "tool": "get_current_time", "args": {}},
+        ])
+        self.assertEqual(states, {"read": "failed", "summary": "skipped", "search": "failed",
+                                  "after-search": "skipped", "independent": "done"})
+        self.assertEqual(self.errors("file_read"), 1)
+        self.assertEqual(self.errors("file_search"), 1)
+
+    async def test_no_matches_is_not_a_failure(self):
+        with open(self.path("a.txt"), "w") as f:
+            f.write("nothing to see\n")
+        states = await self.run_plan([
+            {"id": "search", "tool": "file_search", "args": {"pattern": "needle", "directory": self.workdir}},
+            {"id": "notify", "tool": "message_notify", "args": {"text": "{{search}}"}},
+        ])
+        self.assertEqual(states, {"search": "done", "notify": "done"})
+
+    async def test_command_exiting_non_zero_fails(self):
+        states = await self.run_plan([
+            {"id": "fail", "tool": "execute_shell", "args": {"command": "echo done; exit 2", "working_dir": self.workdir}},
+            {"id": "notify", "tool": "message_notify", "args": {"text": "{{fail}}"}},
+        ])
+        self.assertEqual(states, {"fail": "failed", "notify": "skipped"})
+        self.assertEqual(self.errors("execute_shell"), 1)
+
+    async def test_plan_with_failed_steps_is_not_itself_failed(self):
+        await self.run_plan([{"id": "read", "tool": "file_read", "args": {"file": self.path("missing.txt")}}])
+        self.assertEqual(self.errors("execute_plan"), 0)
+        self.assertEqual(self.errors("file_read"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Tests for the Jarvis execute_shell tool against real local commands.
+
+Linux only, they run /bin/sh commands and look at /proc. Needs pydantic and
+requests, but not OpenWebUI itself.
+
+Usage:
+    python -m pytest test_execute_shell.py
+    python -m unittest test_execute_shell
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+JARVIS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Jarvis.py")
+
+
+def load_jarvis():
+    spec = importlib.util.spec_from_file_location("jarvis", JARVIS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+jarvis = load_jarvis()
+
+
+def process_alive(pid: int) -> bool:
+    """True while `pid` exists and is not a zombie waiting to be reaped."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "runs Linux shell commands")
+class ExecuteShellTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tools = jarvis.Tools()
+        self.tools.valves.tool_cache_enabled = False
+        self.workdir = tempfile.mkdtemp(prefix="jarvis-shell-test-")
+
+    def tearDown(self):
+        for name in os.listdir(self.workdir):
+            os.remove(os.path.join(self.workdir, name))
+        os.rmdir(self.workdir)
+
+    async def run_shell(self, command: str, **kwargs) -> str:
+        return await self.tools.execute_shell(command, working_dir=self.workdir, **kwargs)
+
+    async def test_success_output_and_exit_code(self):
+        result = await self.run_shell("echo hello; echo oops >&2")
+        self.assertIn("hello\n", result)
+        # stderr is merged into the output
+        self.assertIn("oops\n", result)
+        self.assertTrue(result.endswith("[Exit code: 0]"))
+
+    async def test_nonzero_exit_code(self):
+        result = await self.run_shell("echo failing; exit 3")
+        self.assertIn("failing", result)
+        self.assertTrue(result.endswith("[Exit code: 3]"))
+
+    async def test_runs_in_working_dir(self):
+        result = await self.run_shell("pwd")
+        self.assertIn(os.path.realpath(self.workdir), result)
+
+    async def test_missing_working_dir(self):
+        result = await self.tools.execute_shell("true", working_dir=os.path.join(self.workdir, "missing"))
+        self.assertTrue(result.startswith("Working directory not found"))
+
+    async def test_disabled(self):
+        self.tools.valves.shell_operations_enabled = False
+        self.assertEqual(await self.run_shell("true"), "Shell operations are disabled")
+
+    async def test_large_output_keeps_head_and_tail(self):
+        self.tools.valves.shell_output_head_bytes = 100
+        self.tools.valves.shell_output_tail_bytes = 50
+        # 200000 numbered lines, about 1.3 MB
+        result = await self.run_shell("seq 1 200000")
+        total = sum(len(f"{i}\n") for i in range(1, 200001))
+        expected_head = "".join(f"{i}\n" for i in range(1, 100))[:100]
+        expected_tail = "".join(f"{i}\n" for i in range(199980, 200001))[-50:]
+
+        self.assertTrue(result.startswith(expected_head))
+        self.assertIn(f"... [{total - 150} bytes of output omitted] ...", result)
+        self.assertIn(expected_tail + "\n[Exit code: 0]", result)
+        self.assertLess(len(result), 400)
+
+    async def test_small_output_is_not_truncated(self):
+        self.tools.valves.shell_output_head_bytes = 100
+        self.tools.valves.shell_output_tail_bytes = 50
+        result = await self.run_shell("seq 1 30")
+        self.assertNotIn("omitted", result)
+        self.assertEqual(result, "".join(f"{i}\n" for i in range(1, 31)) + "\n[Exit code: 0]")
+
+    async def test_timeout_kills_process_group(self):
+        pid_file = os.path.join(self.workdir, "child.pid")
+        # The background sleep is a grandchild of the tool, only a process
+        # group kill reaches it
+        command = f"sleep 30 & echo $! > {pid_file}; echo started; sleep 30"
+        started = time.monotonic()
+        result = await self.run_shell(command, timeout=1)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 5)
+        self.assertIn("started", result)
+        self.assertTrue(result.endswith("[Command timed out after 1 seconds and was killed]"))
+        with open(pid_file) as f:
+            child = int(f.read())
+        for _ in range(50):
+            if not process_alive(child):
+                break
+            await asyncio.sleep(0.1)
+        self.assertFalse(process_alive(child))
+
+    async def test_timeout_defaults_to_valve(self):
+        self.tools.valves.shell_timeout = 1
+        result = await self.run_shell("sleep 30")
+        self.assertIn("timed out after 1 seconds", result)
+
+    async def test_concurrency_limit(self):
+        self.tools.valves.shell_max_concurrency = 2
+        log = os.path.join(self.workdir, "running.log")
+        # Every command logs +1 when it starts and -1 when it ends
+        command = f"echo 1 >> {log}; sleep 0.3; echo -1 >> {log}"
+        started = time.monotonic()
+        results = await asyncio.gather(*(self.run_shell(command) for _ in range(6)))
+        elapsed = time.monotonic() - started
+
+        self.assertTrue(all(result.endswith("[Exit code: 0]") for result in results))
+        running, peak = 0, 0
+        with open(log) as f:
+            for line in f:
+                running += int(line)
+                peak = max(peak, running)
+        self.assertEqual(peak, 2)
+        # Three rounds of two commands
+        self.assertGreaterEqual(elapsed, 0.9)
+
+    async def test_streams_status_events(self):
+        events = []
+
+        async def emitter(event):
+            events.append(event)
+
+        command = "for i in 1 2 3; do echo line$i; sleep 0.4; done"
+        result = await self.run_shell(command, __event_emitter__=emitter)
+        self.assertTrue(result.endswith("[Exit code: 0]"))
+
+        statuses = [event["data"] for event in events if event["type"] == "status"]
+        descriptions = [status["description"] for status in statuses]
+        self.assertEqual(descriptions[0], f"Executing command: {command}")
+        # The latest line is echoed while the command runs
+        for line in ("line1", "line2", "line3"):
+            self.assertIn(line, descriptions)
+        self.assertFalse(any(status["done"] for status in statuses[:-1]))
+        self.assertEqual(statuses[-1], {"description": f"Finished command: {command}", "done": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Benchmark the o1 pipe's two backend paths against the fake backend:
+
+    router  OpenWebUI style, a new aiohttp session per call (as the
+            open_webui.routers.ollama/openai handlers do)
+    direct  the pipe's shared pooled DirectBackendClient
+
+Reports time to first token and tokens/sec at a few concurrency levels.
+Needs pydantic, fastapi and aiohttp, but not OpenWebUI itself.
+
+Usage:
+    python bench_backend.py --tokens 500 --requests 32 --concurrency 1,8
+"""
+
+import argparse
+import asyncio
+import logging
+import importlib.util
+import os
+import statistics
+import sys
+import types
+from time import perf_counter
+
+import aiohttp
+
+from fake_backend import FakeBackend
+
+PIPE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "o1-function.py")
+
+# Where the stubbed routers send requests, set by the benchmark
+ROUTER_URLS = {"ollama": "", "openai": ""}
+
+
+class RouterResponse:
+    """
+    Mirrors the StreamingResponse the OpenWebUI routers hand back, which has no
+    close() and releases the upstream session in its background task.
+    """
+
+    def __init__(self, response, session):
+        self._response = response
+        self._session = session
+        self.body_iterator = response.content
+        self.background = self._cleanup
+
+    async def _cleanup(self):
+        self._response.close()
+        await self._session.close()
+
+
+async def _router_chat(api: str, form_data: dict):
+    session = aiohttp.ClientSession(trust_env=True)
+    path = "/api/chat" if api == "ollama" else "/v1/chat/completions"
+    response = await session.post(ROUTER_URLS[api] + path, json=form_data)
+    if form_data.get("stream"):
+        return RouterResponse(response, session)
+    try:
+        return await response.json(content_type=None)
+    finally:
+        response.close()
+        await session.close()
+
+
+def install_open_webui_stubs():
+    """
+    Register just enough of the open_webui package for o1-function.py to
+    import outside an OpenWebUI install.
+    """
+    if "open_webui" in sys.modules:
+        return
+
+    def get_last_user_message(messages):
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return message.get("content")
+        return None
+
+    async def chat_completion(*args, **kwargs):
+        raise NotImplementedError
+
+    async def ollama_chat_completion(request, form_data, user=None):
+        return await _router_chat("ollama", form_data)
+
+    async def openai_chat_completion(request, form_data, user=None):
+        return await _router_chat("openai", form_data)
+
+    modules = {
+        "open_webui": {},
+        "open_webui.utils": {},
+        "open_webui.utils.misc": {"get_last_user_message": get_last_user_message},
+        "open_webui.main": {"chat_completion": chat_completion},
+        "open_webui.routers": {},
+        "open_webui.routers.ollama": {"generate_chat_completion": ollama_chat_completion},
+        "open_webui.routers.openai": {"generate_chat_completion": openai_chat_completion},
+    }
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+
+
+def load_pipe_module():
+    install_open_webui_stubs()
+    spec = importlib.util.spec_from_file_location("o1_function", PIPE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_pipe(module, backend_url: str, direct: bool, openai: bool, **valves):
+    ROUTER_URLS["ollama"] = backend_url
+    ROUTER_URLS["openai"] = backend_url
+    pipe = module.Pipe()
+    settings = {
+        "THINKING_MODEL": "fake-thinker",
+        "RESPONDING_MODEL": "fake-responder",
+        "USE_OPENAI_API_THINKING_MODEL": openai,
+        "USE_OPENAI_API_RESPONDING_MODEL": openai,
+        "USE_DIRECT_BACKEND": direct,
+        "OLLAMA_BASE_URL": backend_url,
+        "OPENAI_BASE_URL": backend_url + "/v1",
+    }
+    settings.update(valves)
+    pipe.valves = pipe.Valves(**settings)
+    pipe.__user__ = module.User(id="bench", email="bench@localhost", name="bench", role="user")
+    pipe.__request__ = None
+    return pipe
+
+
+async def noop_emitter(event):
+    pass
+
+
+async def measure(pipe, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    messages = [{"role": "user", "content": "How fast is the backend?"}]
+    ttfts, rates = [], []
+
+    async def one():
+        async with semaphore:
+            start = perf_counter()
+            first = None
+            count = 0
+            async for _ in pipe.stream_response("fake-responder", messages, False, noop_emitter):
+                if first is None:
+                    first = perf_counter()
+                count += 1
+            end = perf_counter()
+            if first is not None:
+                ttfts.append(first - start)
+                if end > first and count > 1:
+                    rates.append((count - 1) / (end - first))
+
+    wall = perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = perf_counter() - wall
+    return {
+        "ttft_p50_ms": statistics.median(ttfts) * 1000 if ttfts else float("nan"),
+        "ttft_max_ms": max(ttfts) * 1000 if ttfts else float("nan"),
+        "tokens_per_s": statistics.mean(rates) if rates else float("nan"),
+        "requests_per_s": requests / wall,
+    }
+
+
+async def run(args):
+    module = load_pipe_module()
+    module.logger.setLevel(logging.WARNING)
+    backend = FakeBackend(tokens=args.tokens, token_rate=args.token_rate)
+    await backend.start()
+    try:
+        print(f"{'path':<8} {'api':<7} {'conc':>4} {'ttft p50':>10} {'ttft max':>10} {'tok/s':>10} {'req/s':>8}")
+        for openai in (False, True):
+            for direct in (False, True):
+                pipe = make_pipe(module, backend.url, direct, openai, STREAM_READ_SIZE=args.read_size)
+                for concurrency in args.concurrency:
+                    result = await measure(pipe, args.requests, concurrency)
+                    print(
+                        f"{'direct' if direct else 'router':<8} {'openai' if openai else 'ollama':<7} {concurrency:>4} "
+                        f"{result['ttft_p50_ms']:>8.2f}ms {result['ttft_max_ms']:>8.2f}ms "
+                        f"{result['tokens_per_s']:>10.0f} {result['requests_per_s']:>8.1f}"
+                    )
+                if pipe._direct_client is not None:
+                    await pipe._direct_client.close()
+    finally:
+        await backend.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per response")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="fake backend tokens per second, 0 for unlimited")
+    parser.add_argument("--requests", type=int, default=32, help="requests per measurement")
+    parser.add_argument("--read-size", type=int, default=16384, help="STREAM_READ_SIZE valve")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(c) for c in value.split(",")],
+        default=[1, 8],
+        help="comma separated concurrency levels",
+    )
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark harness for the o1 pipe.
+
+Drives Pipe.pipe() end to end with a stub __event_emitter__ and __request__
+against the fake backend, which runs in its own process so its CPU time is
+not charged to the pipe. For each concurrency level it reports
+
+    latency     end-to-end time of pipe() per request (p50 / p95)
+    ttfa        time to the first visible answer token (p50 / p95)
+    events      events emitted per request
+    cpu/token   pipe process CPU time per streamed token
+    peak mem    peak traced Python memory while the level ran
+
+Needs pydantic, fastapi and aiohttp, but not OpenWebUI itself.
+
+Usage:
+    python bench_pipe.py --concurrency 1,4,16 --requests 32
+    python bench_pipe.py --pipelined --thinking-models 3 --stall-every 50 --stall-seconds 0.2
+    python bench_pipe.py --router --openai
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import time
+import tracemalloc
+from time import perf_counter
+
+from bench_backend import load_pipe_module, make_pipe
+from fake_backend import add_backend_arguments, backend_from_args
+
+
+def run_backend(args, port_queue):
+    async def serve():
+        backend = backend_from_args(args)
+        port_queue.put(await backend.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+class StubRequest:
+    """Stands in for the FastAPI request, a client that never disconnects."""
+
+    async def is_disconnected(self):
+        return False
+
+
+class EventRecorder:
+    """Stub __event_emitter__ that counts events and notes the first answer."""
+
+    def __init__(self):
+        self.events = 0
+        self.first_answer = None
+
+    async def __call__(self, event):
+        self.events += 1
+        if (
+            self.first_answer is None
+            and event.get("type") == "message"
+            and event["data"].get("role") == "assistant"
+            and not event["data"]["content"].startswith("\n###")
+        ):
+            self.first_answer = perf_counter()
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_level(pipe, requests: int, concurrency: int, tokens_per_request: int, trace_memory: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    user = {"id": "bench", "email": "bench@localhost", "name": "bench", "role": "user"}
+    latencies, ttfas, events = [], [], []
+
+    async def one(i):
+        async with semaphore:
+            recorder = EventRecorder()
+            body = {"messages": [{"role": "user", "content": f"Benchmark question {i}?"}]}
+            start = perf_counter()
+            await pipe.pipe(body, user, recorder, StubRequest())
+            latencies.append(perf_counter() - start)
+            events.append(recorder.events)
+            if recorder.first_answer is not None:
+                ttfas.append(recorder.first_answer - start)
+
+    if trace_memory:
+        tracemalloc.reset_peak()
+    cpu = time.process_time()
+    wall = perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = perf_counter() - wall
+    cpu = time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+
+    return {
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "ttfa_p50": percentile(ttfas, 0.5),
+        "ttfa_p95": percentile(ttfas, 0.95),
+        "events": statistics.mean(events) if events else 0,
+        "cpu_per_token_us": cpu / max(1, requests * tokens_per_request) * 1e6,
+        "requests_per_s": requests / wall,
+        "peak_mb": peak / 1e6 if peak is not None else None,
+    }
+
+
+async def run(args):
+    module = load_pipe_module()
+    module.logger.setLevel(logging.WARNING)
+    port_queue = multiprocessing.Queue()
+    backend = multiprocessing.Process(target=run_backend, args=(args, port_queue), daemon=True)
+    backend.start()
+    try:
+        url = f"http://{args.host}:{port_queue.get(timeout=10)}"
+        thinking_models = ",".join(f"fake-thinker-{i}" for i in range(args.thinking_models))
+        pipe = make_pipe(
+            module,
+            url,
+            direct=not args.router,
+            openai=args.openai,
+            THINKING_MODEL=thinking_models,
+            ENABLE_PIPELINED_RESPONDING=args.pipelined,
+            ENABLE_REASONING_CACHE=False,
+            ENABLE_SHOW_THINKING_TRACE=args.show_thinking,
+        )
+        # Thinking models plus the responder each stream the configured tokens
+        tokens_per_request = args.tokens * (args.thinking_models + 1)
+
+        if args.trace_memory:
+            tracemalloc.start()
+        print(
+            f"{'conc':>4} {'lat p50':>9} {'lat p95':>9} {'ttfa p50':>9} {'ttfa p95':>9} "
+            f"{'events':>7} {'cpu/tok':>9} {'req/s':>7} {'peak MB':>8}"
+        )
+        for concurrency in args.concurrency:
+            result = await run_level(
+                pipe, args.requests, concurrency, tokens_per_request, args.trace_memory
+            )
+            peak = f"{result['peak_mb']:>8.1f}" if result["peak_mb"] is not None else f"{'n/a':>8}"
+            print(
+                f"{concurrency:>4} {result['latency_p50']:>8.3f}s {result['latency_p95']:>8.3f}s "
+                f"{result['ttfa_p50']:>8.3f}s {result['ttfa_p95']:>8.3f}s "
+                f"{result['events']:>7.0f} {result['cpu_per_token_us']:>7.1f}us "
+                f"{result['requests_per_s']:>7.1f} {peak}"
+            )
+        if pipe._direct_client is not None:
+            await pipe._direct_client.close()
+    finally:
+        backend.terminate()
+        backend.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_backend_arguments(parser, port=0)
+    parser.add_argument("--requests", type=int, default=16, help="requests per concurrency level")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(c) for c in value.split(",")],
+        default=[1, 4, 16],
+        help="comma separated concurrency levels",
+    )
+    parser.add_argument("--thinking-models", type=int, default=1, help="number of thinking models")
+    parser.add_argument("--pipelined", action="store_true", help="enable pipelined responding")
+    parser.add_argument("--show-thinking", action="store_true", help="emit thinking traces")
+    parser.add_argument("--router", action="store_true", help="use the OpenWebUI router path instead of the direct client")
+    parser.add_argument("--openai", action="store_true", help="use the OpenAI API instead of Ollama")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false", help="skip tracemalloc")
+    asyncio.run(run(parser.parse_args()))
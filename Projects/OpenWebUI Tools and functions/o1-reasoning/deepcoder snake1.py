@@ -1,97 +1,233 @@
-import pygame
+"""
+Simple snake game.
+
+The board is a grid of cells numbered y * cols + x. The snake is a deque of
+cells with an occupancy bitmap, so moving and collision checks are O(1) no
+matter how long it gets, and a list of free cells (with each cell's position
+in it) lets food be placed in O(1) on a cell the snake is not on. Only the
+cells that changed are redrawn and pushed to the display each frame.
+
+Usage:
+    python "deepcoder snake1.py"                      play
+    python "deepcoder snake1.py" --benchmark          headless frames/sec
+    python "deepcoder snake1.py" --benchmark --frames 50000 --length 40
+"""
+
+import argparse
+import os
 import random
+import sys
+from collections import deque
+from time import perf_counter
 
-# Initialize Pygame and set up the game window
-pygame.init()
-screen = pygame.display.set_mode((600, 600))
-pygame.display.set_caption("Simple Snake Game")
+import pygame
 
 # Colors and game settings
 black = (0, 0, 0)
 white = (255, 255, 255)
+red = (255, 0, 0)
+green = (0, 255, 0)
 
 # Snake and food properties
 snake_block = 15
 speed = 0.15
 
-# Initialize snake and food
-snake_x = screen.get_width() // 2
-snake_y = screen.get_height() // 2
-food_x = round(random.randrange(0, screen.get_width() - snake_block) / snake_block) * snake_block
-food_y = round(random.randrange(0, screen.get_height() - snake_block) / snake_block) * snake_block
-
-# Game variables
-direction = 'right'
-snake_list = [[snake_x, snake_y]]
-score = 0
-clock = pygame.time.Clock()
-
-def display_score():
-    font = pygame.font.SysFont(None, 25)
-    score_text = font.render(f"Score: {score}", True, white)
-    screen.blit(score_text, (0, 0))
-
-# Game loop
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_LEFT and direction != 'right':
-                direction = 'left'
-            elif event.key == pygame.K_RIGHT and direction != 'left':
-                direction = 'right'
-            elif event.key == pygame.K_UP and direction != 'down':
-                direction = 'up'
-            elif event.key == pygame.K_DOWN and direction != 'up':
-                direction = 'down'
-
-    # Move the snake
-    if direction == 'right':
-        snake_x += snake_block
-    elif direction == 'left':
-        snake_x -= snake_block
-    elif direction == 'up':
-        snake_y -= snake_block
-    elif direction == 'down':
-        snake_y += snake_block
-
-    # Wrap around the screen edges
-    if snake_x >= screen.get_width():
-        snake_x = 0
-    elif snake_x < 0:
-        snake_x = screen.get_width() - snake_block
-    if snake_y >= screen.get_height():
-        snake_y = 0
-    elif snake_y < 0:
-        snake_y = screen.get_height() - snake_block
-
-    # Check for collisions
-    snake_head = (snake_x, snake_y)
-    if snake_head in snake_list[:-1]:
-        break
-    
-    # Check if food is eaten
-    if snake_x == food_x and snake_y == food_y:
-        food_x = round(random.randrange(0, screen.get_width() - snake_block) / snake_block) * snake_block
-        food_y = round(random.randrange(0, screen.get_height() - snake_block) / snake_block) * snake_block
-        score += 1
+width, height = 600, 600
+
+MOVES = {'right': (1, 0), 'left': (-1, 0), 'up': (0, -1), 'down': (0, 1)}
+OPPOSITE = {'right': 'left', 'left': 'right', 'up': 'down', 'down': 'up'}
+KEYS = {pygame.K_LEFT: 'left', pygame.K_RIGHT: 'right', pygame.K_UP: 'up', pygame.K_DOWN: 'down'}
+
+
+class SnakeGame:
+    def __init__(self, screen, length=1):
+        self.screen = screen
+        self.cols = screen.get_width() // snake_block
+        self.rows = screen.get_height() // snake_block
+        cells = self.cols * self.rows
+
+        # Free cells, and each cell's index in that list (-1 while occupied)
+        self.free = list(range(cells))
+        self.free_index = list(range(cells))
+        self.occupied = bytearray(cells)
+
+        # Start in the middle, with any extra length trailing to the left
+        x, y = self.cols // 2, self.rows // 2
+        self.body = deque()
+        for i in range(min(length, self.cols) - 1, -1, -1):
+            self._occupy(y * self.cols + (x - i) % self.cols)
+        self.direction = 'right'
+        self.score = 0
+        self.alive = True
+        self.food = self._place_food()
+
+        self.font = pygame.font.SysFont(None, 25)
+        self.score_surface = None
+        self.score_surface_for = None
+        self.score_rect = pygame.Rect(0, 0, 0, 0)
+
+    def _occupy(self, cell):
+        # Swap-remove the cell from the free list
+        i = self.free_index[cell]
+        last = self.free.pop()
+        if last != cell:
+            self.free[i] = last
+            self.free_index[last] = i
+        self.free_index[cell] = -1
+        self.occupied[cell] = 1
+        self.body.append(cell)
+
+    def _vacate(self):
+        cell = self.body.popleft()
+        self.occupied[cell] = 0
+        self.free_index[cell] = len(self.free)
+        self.free.append(cell)
+        return cell
+
+    def _place_food(self):
+        return random.choice(self.free) if self.free else None
+
+    def turn(self, direction):
+        if direction != OPPOSITE[self.direction]:
+            self.direction = direction
+
+    def step(self):
+        """Advance one frame, returns the cells that changed"""
+        head = self.body[-1]
+        dx, dy = MOVES[self.direction]
+        # Wrap around the screen edges
+        x = (head % self.cols + dx) % self.cols
+        y = (head // self.cols + dy) % self.rows
+        head = y * self.cols + x
+
+        changed = [head]
+        eating = head == self.food
+        if not eating:
+            # The tail moves out of the way first, so the head may follow it
+            changed.append(self._vacate())
+        if self.occupied[head]:
+            self.alive = False
+            return changed
+        self._occupy(head)
+
+        if eating:
+            self.score += 1
+            self.food = self._place_food()
+            if self.food is None:
+                self.alive = False
+            else:
+                changed.append(self.food)
+        return changed
+
+    def _cell_rect(self, cell):
+        return pygame.Rect(cell % self.cols * snake_block, cell // self.cols * snake_block, snake_block, snake_block)
+
+    def _draw_cell(self, cell):
+        color = green if self.occupied[cell] else red if cell == self.food else black
+        rect = self._cell_rect(cell)
+        self.screen.fill(color, rect)
+        return rect
+
+    def _draw_score(self):
+        # Clear what is under the old text and redraw the cells it covered
+        area = self.score_rect
+        if self.score_surface_for != self.score:
+            self.score_surface = self.font.render(f"Score: {self.score}", True, white)
+            self.score_surface_for = self.score
+            area = area.union(self.score_surface.get_rect())
+        self.score_rect = self.score_surface.get_rect()
+        for row in range(min(self.rows, (area.bottom - 1) // snake_block + 1)):
+            for col in range(min(self.cols, (area.right - 1) // snake_block + 1)):
+                self._draw_cell(row * self.cols + col)
+        self.screen.blit(self.score_surface, (0, 0))
+        return area
+
+    def draw_all(self):
+        self.screen.fill(black)
+        for cell in self.body:
+            self._draw_cell(cell)
+        if self.food is not None:
+            self._draw_cell(self.food)
+        self._draw_score()
+        pygame.display.update()
+
+    def draw(self, changed):
+        """Redraw the changed cells and push only those areas to the display"""
+        rects = [self._draw_cell(cell) for cell in changed]
+        if self.score_surface_for != self.score or any(self.score_rect.colliderect(rect) for rect in rects):
+            rects.append(self._draw_score())
+        pygame.display.update(rects)
+
+
+def play():
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Simple Snake Game")
+    clock = pygame.time.Clock()
+
+    game = SnakeGame(screen)
+    game.draw_all()
+    while game.alive:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN and event.key in KEYS:
+                game.turn(KEYS[event.key])
+        game.draw(game.step())
+        clock.tick(1 / speed)
+
+    # Exit the game
+    pygame.quit()
+
+
+def benchmark(frames, length):
+    """
+    Run the engine uncapped on SDL's dummy video driver. The snake goes right
+    across each row and one cell down at the end of it, a path that covers the
+    whole (square) board, so it never hits itself and keeps eating until the
+    board is full, then the game restarts.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    random.seed(0)
+
+    game = SnakeGame(screen, length)
+    game.draw_all()
+    # How far along its row the head is, counting the tail as the start of the row
+    position = len(game.body) - 1
+    games, longest = 1, len(game.body)
+    started = perf_counter()
+    for _ in range(frames):
+        game.turn('down' if position % game.cols == game.cols - 1 else 'right')
+        position += 1
+        game.draw(game.step())
+        longest = max(longest, len(game.body))
+        if not game.alive:
+            game = SnakeGame(screen, length)
+            game.draw_all()
+            position = len(game.body) - 1
+            games += 1
+    elapsed = perf_counter() - started
+    pygame.quit()
+
+    print(f"{frames} frames in {elapsed:.2f}s, {frames / elapsed:.0f} frames/sec, "
+          f"{games} games, longest snake {longest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmark", action="store_true", help="run headless and report frames/sec")
+    parser.add_argument("--frames", type=int, default=20000, help="frames to run in the benchmark")
+    parser.add_argument("--length", type=int, default=1, help="starting snake length in the benchmark, up to one row")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.frames, args.length)
     else:
-        snake_list.pop(0)
-
-    # Update the snake's position
-    snake_list.append([snake_x, snake_y])
-
-    # Draw everything on the screen
-    screen.fill(black)
-    pygame.draw.rect(screen, (255, 0, 0), (food_x, food_y, snake_block, snake_block))
-    for x in snake_list:
-        pygame.draw.rect(screen, (0, 255, 0), (x[0], x[1], snake_block, snake_block))
-    
-    display_score()
-    pygame.display.update()
-    clock.tick(1 / speed)
-
-# Exit the game
-pygame.quit()
\ No newline at end of file
+        play()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Fake streaming Ollama / OpenAI backend used to benchmark the o1 pipe without
+a GPU. Speaks just enough HTTP/1.1 (keep-alive, chunked responses) to serve
+
+    POST /api/chat              Ollama NDJSON stream or single JSON reply
+    POST /v1/chat/completions   OpenAI server-sent events or single JSON reply
+
+Token rate, tokens per frame, a first-token delay (prompt processing) and
+periodic stalls can be configured to mimic a loaded GPU.
+
+Usage:
+    python fake_backend.py --port 11434 --tokens 300 --token-rate 200
+    python fake_backend.py --tokens 500 --tokens-per-chunk 4 --stall-every 100 --stall-seconds 0.5
+"""
+
+import argparse
+import asyncio
+import json
+from time import perf_counter
+
+
+class FakeBackend:
+    def __init__(
+        self,
+        tokens: int = 200,
+        token_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tokens_per_chunk: int = 1,
+        first_token_delay: float = 0.0,
+        stall_every: int = 0,
+        stall_seconds: float = 0.0,
+    ):
+        """
+        Args:
+            tokens: Tokens generated per chat request.
+            token_rate: Tokens per second, 0 streams as fast as possible.
+            host: Interface to listen on.
+            port: Port to listen on, 0 picks a free one.
+            tokens_per_chunk: Tokens packed into each streamed frame.
+            first_token_delay: Seconds before the first frame, like prompt processing.
+            stall_every: Pause the stream after every this many tokens, 0 never stalls.
+            stall_seconds: Length of each stall.
+        """
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.tokens_per_chunk = max(1, tokens_per_chunk)
+        self.first_token_delay = first_token_delay
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = json.loads(await reader.readexactly(length)) if length else {}
+
+                self.requests += 1
+                if method == "POST" and path.rstrip("/").endswith("/api/chat"):
+                    await self.reply(writer, body, openai=False)
+                elif method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                    await self.reply(writer, body, openai=True)
+                else:
+                    await self.write_head(writer, 404, "text/plain", len(b"not found"))
+                    writer.write(b"not found")
+                    await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_head(self, writer, status: int, content_type: str, length: int = -1):
+        head = f"HTTP/1.1 {status} {'OK' if status == 200 else 'Not Found'}\r\n"
+        head += f"Content-Type: {content_type}\r\n"
+        if length >= 0:
+            head += f"Content-Length: {length}\r\n"
+        else:
+            head += "Transfer-Encoding: chunked\r\n"
+        head += "Connection: keep-alive\r\n\r\n"
+        writer.write(head.encode("latin-1"))
+
+    def token(self, i: int) -> str:
+        return f"tok{i} "
+
+    def frame(self, model: str, content: str, openai: bool) -> bytes:
+        if openai:
+            data = {
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content}}],
+            }
+            return f"data: {json.dumps(data)}\n\n".encode("utf-8")
+        data = {"model": model, "message": {"role": "assistant", "content": content}, "done": False}
+        return (json.dumps(data) + "\n").encode("utf-8")
+
+    def final_frame(self, model: str, body: dict, elapsed: float, openai: bool) -> bytes:
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+        if openai:
+            frames = ""
+            if body.get("stream_options", {}).get("include_usage"):
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": self.tokens,
+                    "total_tokens": prompt_tokens + self.tokens,
+                }
+                frames += f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            return (frames + "data: [DONE]\n\n").encode("utf-8")
+        data = {
+            "model": model,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(elapsed * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": 1_000_000,
+            "eval_count": self.tokens,
+            "eval_duration": max(1, int(elapsed * 1e9)),
+        }
+        return (json.dumps(data) + "\n").encode("utf-8")
+
+    async def reply(self, writer: asyncio.StreamWriter, body: dict, openai: bool):
+        model = body.get("model", "fake")
+        if not body.get("stream", True):
+            await self.wait_for_tokens(self.tokens)
+            content = "".join(self.token(i) for i in range(self.tokens))
+            if openai:
+                data = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+            else:
+                data = {"model": model, "message": {"role": "assistant", "content": content}, "done": True}
+            payload = json.dumps(data).encode("utf-8")
+            await self.write_head(writer, 200, "application/json", len(payload))
+            writer.write(payload)
+            await writer.drain()
+            return
+
+        content_type = "text/event-stream" if openai else "application/x-ndjson"
+        await self.write_head(writer, 200, content_type)
+        await writer.drain()
+        if self.first_token_delay > 0:
+            await asyncio.sleep(self.first_token_delay)
+        start = perf_counter()
+        stalled = 0.0
+        next_stall = self.stall_every
+        for i in range(0, self.tokens, self.tokens_per_chunk):
+            end = min(i + self.tokens_per_chunk, self.tokens)
+            if self.stall_every > 0 and i >= next_stall:
+                await asyncio.sleep(self.stall_seconds)
+                stalled += self.stall_seconds
+                next_stall += self.stall_every
+            if self.token_rate > 0:
+                delay = start + stalled + end / self.token_rate - perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            content = "".join(self.token(j) for j in range(i, end))
+            self.write_chunk(writer, self.frame(model, content, openai))
+            await writer.drain()
+        self.write_chunk(writer, self.final_frame(model, body, perf_counter() - start, openai))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def wait_for_tokens(self, count: int):
+        delay = self.first_token_delay
+        if self.token_rate > 0:
+            delay += count / self.token_rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def write_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+
+def backend_from_args(args) -> FakeBackend:
+    return FakeBackend(
+        tokens=args.tokens,
+        token_rate=args.token_rate,
+        host=args.host,
+        port=args.port,
+        tokens_per_chunk=args.tokens_per_chunk,
+        first_token_delay=args.first_token_delay,
+        stall_every=args.stall_every,
+        stall_seconds=args.stall_seconds,
+    )
+
+
+def add_backend_arguments(parser: argparse.ArgumentParser, port: int = 11434):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens generated per request")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="tokens per second, 0 for unlimited")
+    parser.add_argument("--tokens-per-chunk", type=int, default=1, help="tokens in each streamed frame")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--stall-every", type=int, default=0, help="stall after every N tokens, 0 never stalls")
+    parser.add_argument("--stall-seconds", type=float, default=0.0, help="length of each stall")
+
+
+async def serve(args):
+    backend = backend_from_args(args)
+    await backend.start()
+    print(f"Fake backend listening on {backend.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_backend_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
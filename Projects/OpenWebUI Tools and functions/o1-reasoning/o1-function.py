@@ -24,6 +24,15 @@ Use the configuration menu (accessed via the settings cog) to tailor the pipelin
     Select Models: Choose your desired thinking models and response model.
     Show Reasoning: Decide whether to display the reasoning process or keep it hidden.
     Set Thinking Time: Specify the maximum time allowed for the reasoning model to process.
+    Reasoning Cache: Reuse thinking for repeated questions, in memory and optionally in a SQLite file.
+    Pipelined Responding: Think with all models at once and start the response once a quorum is ready.
+    Direct Backend: Talk to Ollama/OpenAI over a shared pooled HTTP client instead of the OpenWebUI routers.
+    Cancel On Disconnect: Stop every in-flight generation as soon as the user goes away.
+    Metrics: Export per request time to first token, tokens/sec, bytes and cancellations as JSONL or Prometheus text.
+    Keep Alive / Warmup: Keep Ollama models loaded and preload them whenever the model valves change.
+    Task Model: Send titles, tags and autocomplete to a small model, with cached and coalesced results.
+    Reasoning Compression: Deduplicate and trim the reasonings locally so the responder prompt stays small.
+    Context Budget: Trim or summarize older turns so each model only sees an estimated token budget.
 Save and Apply:
 Once configured, save your settings to apply the changes.
 You should now have o1 at home in your dorp down.
@@ -32,9 +41,19 @@ These steps ensure the pipe is set up correctly and functions according to your
 """
 
 import json
-from time import time
+import codecs
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextvars import ContextVar
+from time import time, perf_counter
 from pydantic import BaseModel, Field
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Callable, Awaitable, Any, AsyncGenerator
 import asyncio
 from fastapi import Request
@@ -44,6 +63,11 @@ from open_webui.routers.ollama import generate_chat_completion as ollama_chat_co
 from open_webui.routers.openai import generate_chat_completion as openai_chat_completion
 import logging
 
+try:
+    import aiohttp
+except ImportError:  # Only needed for the direct backend client
+    aiohttp = None
+
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     logger.setLevel(logging.DEBUG)
@@ -57,6 +81,156 @@ if not logger.handlers:
     logger.propagate = False
 
 
+# Instructions are kept byte-for-byte stable and placed ahead of the history so
+# backends can reuse the cached prompt prefix between turns. Anything that
+# changes per request (the query, reasonings) goes last.
+THINKING_SYSTEM_PROMPT = (
+    "You are a reasoning model.\n"
+    "Think carefully about the user's latest request and output your reasoning steps.\n"
+    "Do not answer the user directly, just produce a hidden reasoning chain.\n"
+    "First rephrase the user prompt, then answer using multiple thinking-path to give all possible answers."
+)
+
+RESPONDING_SYSTEM_PROMPT = (
+    "You are a helpful assistant.\n"
+    "The user's latest message is followed by internal reasoning that was produced to guide your response.\n"
+    "Use this reasoning to respond in concise and helpful manner to the user's query, "
+    "do not mention the reasoning itself."
+)
+
+
+class ReasoningCompressor:
+    """
+    Shrinks reasoning traces before they are handed to the responder without
+    calling another model: sentences repeated across traces are dropped, the
+    rest are ranked by TF-IDF similarity to the combined traces and the best
+    ones are kept, in their original order, up to a token budget.
+    """
+
+    _SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+    _WORD = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, token_budget: int, dedup_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return (len(text) + 3) // 4
+
+    def compress(self, traces: List[str]) -> List[str]:
+        # (trace index, position, text, words)
+        sentences = []
+        for t, trace in enumerate(traces):
+            for position, sentence in enumerate(self._SENTENCE_SPLIT.split(trace)):
+                sentence = sentence.strip()
+                if sentence:
+                    words = self._WORD.findall(sentence.lower())
+                    sentences.append((t, position, sentence, words))
+
+        kept = self.deduplicate(sentences)
+        total = sum(self.estimate_tokens(s[2]) for s in kept)
+        if self.token_budget > 0 and total > self.token_budget:
+            kept = self.select(kept)
+
+        compressed = [[] for _ in traces]
+        for t, position, sentence, _ in sorted(kept, key=lambda s: (s[0], s[1])):
+            compressed[t].append(sentence)
+        return ["\n".join(parts) for parts in compressed if parts]
+
+    def deduplicate(self, sentences: list) -> list:
+        """Drop exact and near duplicate sentences, keeping the first seen."""
+        kept = []
+        seen_exact = set()
+        # Word sets of kept sentences indexed by word, so each sentence is only
+        # compared with kept sentences it shares a word with
+        kept_sets = []
+        by_word = {}
+        for sentence in sentences:
+            words = sentence[3]
+            key = " ".join(words) or sentence[2]
+            if key in seen_exact:
+                continue
+            word_set = set(words)
+            duplicate = False
+            if word_set and self.dedup_threshold < 1:
+                candidates = set()
+                for word in word_set:
+                    candidates.update(by_word.get(word, ()))
+                for i in candidates:
+                    other = kept_sets[i]
+                    overlap = len(word_set & other)
+                    if overlap / len(word_set | other) >= self.dedup_threshold:
+                        duplicate = True
+                        break
+            if duplicate:
+                continue
+            seen_exact.add(key)
+            index = len(kept_sets)
+            kept_sets.append(word_set)
+            for word in word_set:
+                by_word.setdefault(word, []).append(index)
+            kept.append(sentence)
+        return kept
+
+    def select(self, sentences: list) -> list:
+        """
+        Keep the sentences closest to the TF-IDF centroid within budget. When
+        not even the best one fits, as with a trace without punctuation, it
+        is cut down to the budget rather than dropping everything.
+        """
+        document_frequency = {}
+        for sentence in sentences:
+            for word in set(sentence[3]):
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        count = len(sentences)
+        idf = {
+            word: math.log((1 + count) / (1 + df)) + 1.0
+            for word, df in document_frequency.items()
+        }
+
+        vectors = []
+        centroid = {}
+        for sentence in sentences:
+            vector = {}
+            for word in sentence[3]:
+                vector[word] = vector.get(word, 0.0) + idf[word]
+            norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+            vector = {word: v / norm for word, v in vector.items()}
+            vectors.append(vector)
+            for word, v in vector.items():
+                centroid[word] = centroid.get(word, 0.0) + v
+
+        centroid_norm = math.sqrt(sum(v * v for v in centroid.values())) or 1.0
+        scored = []
+        for i, vector in enumerate(vectors):
+            score = sum(v * centroid.get(word, 0.0) for word, v in vector.items())
+            scored.append((score / centroid_norm, i))
+        scored.sort(reverse=True)
+
+        chosen = []
+        used = 0
+        for _, i in scored:
+            cost = self.estimate_tokens(sentences[i][2])
+            if used + cost > self.token_budget:
+                continue
+            chosen.append(sentences[i])
+            used += cost
+        if not chosen and scored:
+            t, position, text, words = sentences[scored[0][1]]
+            limit = self.token_budget * 4
+            cut = text[:limit]
+            if text[limit:limit + 1].strip() and " " in cut:
+                # Do not end on half a word
+                cut = cut.rsplit(" ", 1)[0]
+            chosen.append((t, position, cut.rstrip(), words))
+        return chosen
+
+
+class ClientDisconnected(Exception):
+    """Raised when the user is no longer there to receive the response."""
+
+
 @dataclass
 class User:
     id: str
@@ -65,6 +239,505 @@ class User:
     role: str
 
 
+class ResponseCache:
+    """
+    Two tier cache for model outputs, used for thinking model reasonings and
+    background task results.
+
+    The first tier is an in-memory LRU bounded by `max_entries`. The optional
+    second tier is a SQLite file that survives restarts and is bounded by
+    `max_db_entries`. Entries older than `ttl` seconds are treated as misses
+    and evicted on access.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: int,
+        db_path: str = "",
+        max_db_entries: int = 0,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reasoning_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS reasoning_cache_accessed "
+                "ON reasoning_cache (accessed)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_task_key(task: str, model: str, messages: list) -> str:
+        """
+        Build a cache key for a background task from the task name, the task
+        model and a hash of the messages OpenWebUI sent for it.
+        """
+        return hashlib.sha256(
+            json.dumps(
+                [task, model.strip(), [(m.get("role"), m.get("content")) for m in messages]],
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def make_key(model: str, query: str, context: list) -> str:
+        """
+        Build a cache key from the thinking model, the normalized query and a
+        hash of the conversation that precedes the query.
+        """
+        normalized = unicodedata.normalize("NFKC", query or "").lower()
+        normalized = re.sub(r"\s+", " ", normalized).strip().rstrip("?!. ")
+        context_hash = hashlib.sha256(
+            json.dumps(
+                [(m.get("role"), m.get("content")) for m in context],
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        ).hexdigest()
+        return hashlib.sha256(
+            f"{model.strip()}\x00{normalized}\x00{context_hash}".encode("utf-8")
+        ).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl > 0 and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        now = time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT value, created FROM reasoning_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self._expired(created, now):
+                self._db.execute("DELETE FROM reasoning_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE reasoning_cache SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            # Promote to the memory tier for the next lookup
+            self._store_memory(key, value, created)
+            return value
+
+    def put(self, key: str, value: str):
+        now = time()
+        with self._lock:
+            self._store_memory(key, value, now)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO reasoning_cache (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.ttl > 0:
+                self._db.execute(
+                    "DELETE FROM reasoning_cache WHERE created < ?", (now - self.ttl,)
+                )
+            if self.max_db_entries > 0:
+                self._db.execute(
+                    "DELETE FROM reasoning_cache WHERE key IN ("
+                    "SELECT key FROM reasoning_cache ORDER BY accessed DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_db_entries,),
+                )
+            self._db.commit()
+
+    def _store_memory(self, key: str, value: str, created: float):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class ChunkDecoder:
+    """
+    Incremental decoder for one streamed response body, either Ollama NDJSON
+    or OpenAI server-sent events.
+
+    Each stream gets its own decoder so concurrent streams never share a
+    buffer, and multi-byte characters split across reads are reassembled.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self.done = False
+        self.bytes = 0
+        # Token accounting from the backend's final frame, Ollama's `done`
+        # frame or an OpenAI `usage` chunk
+        self.usage = None
+
+    def feed(self, chunk: bytes):
+        """
+        Accumulate chunk data in the buffer and yield the message content of
+        every complete JSON line in it.
+        """
+        self.bytes += len(chunk)
+        self._buffer += self._decoder.decode(chunk)
+
+        while not self.done:
+            newline_index = self._buffer.find("\n")
+            if newline_index == -1:
+                # No complete line yet; wait for more data
+                break
+
+            line = self._buffer[:newline_index].strip()
+            self._buffer = self._buffer[newline_index + 1 :]
+
+            if not line or line.startswith(":") or line.startswith("event:"):
+                continue
+
+            if line.startswith("data:"):
+                line = line[5:].strip()
+                if line == "[DONE]":
+                    self.done = True
+                    break
+
+            try:
+                chunk_data = json.loads(line)
+            except json.JSONDecodeError as e:
+                # A complete line that does not parse will never parse, skip it
+                logger.error(f'ChunkDecodeError: unable to parse "{line[:100]}": {e}')
+                continue
+
+            if "message" in chunk_data and "content" in chunk_data["message"]:
+                yield chunk_data["message"]["content"]
+            elif chunk_data.get("choices"):
+                content = chunk_data["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
+            if chunk_data.get("usage"):
+                self.usage = chunk_data["usage"]
+            if chunk_data.get("done", False):
+                self.usage = chunk_data
+                self.done = True
+
+
+@dataclass
+class StreamMetrics:
+    """Timings and sizes of a single model call."""
+
+    model: str
+    phase: str
+    started: float = field(default_factory=perf_counter)
+    queue_wait: Optional[float] = None
+    ttft: Optional[float] = None
+    duration: float = 0.0
+    chunks: int = 0
+    bytes: int = 0
+    tokens: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    eval_seconds: Optional[float] = None
+    prompt_eval_seconds: Optional[float] = None
+    cancelled: bool = False
+    # Whether the backend ended the stream itself, rather than it failing,
+    # being cut at the time limit or cancelled
+    complete: bool = False
+
+    def record_usage(self, usage: Optional[dict]):
+        """Take accurate token counts from a backend's final frame."""
+        if not usage:
+            return
+        if "eval_count" in usage:
+            self.tokens = usage.get("eval_count")
+            self.prompt_tokens = usage.get("prompt_eval_count")
+            if usage.get("eval_duration"):
+                self.eval_seconds = usage["eval_duration"] / 1e9
+            if usage.get("prompt_eval_duration"):
+                self.prompt_eval_seconds = usage["prompt_eval_duration"] / 1e9
+        elif "completion_tokens" in usage:
+            self.tokens = usage.get("completion_tokens")
+            self.prompt_tokens = usage.get("prompt_tokens")
+
+    @property
+    def output_tokens(self) -> int:
+        return self.tokens if self.tokens is not None else self.chunks
+
+    @property
+    def tokens_per_second(self) -> float:
+        if self.eval_seconds:
+            return self.output_tokens / self.eval_seconds
+        generating = self.duration - (self.ttft or 0.0)
+        return self.output_tokens / generating if generating > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "phase": self.phase,
+            "queue_wait": self.queue_wait,
+            "ttft": self.ttft,
+            "duration": round(self.duration, 6),
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "tokens": self.output_tokens,
+            "tokens_exact": self.tokens is not None,
+            "prompt_tokens": self.prompt_tokens,
+            "tokens_per_second": round(self.tokens_per_second, 3),
+            "cancelled": self.cancelled,
+        }
+
+
+@dataclass
+class RequestMetrics:
+    """Everything measured while serving one chat request."""
+
+    started: float = field(default_factory=perf_counter)
+    timestamp: float = field(default_factory=time)
+    streams: List[StreamMetrics] = field(default_factory=list)
+    events: int = 0
+    duration: float = 0.0
+    first_answer: Optional[float] = None
+    disconnected: bool = False
+    # Per-request state of the chain, kept here rather than on the shared Pipe
+    # because OpenWebUI runs overlapping requests on one Pipe instance
+    first_answer_time: Optional[float] = None
+    thinking_tokens: int = 0
+    max_thinking_time_reached: bool = False
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cancelled_reasonings: int = 0
+    compression_stats: Optional[tuple] = None
+
+    def start_stream(self, model: str, phase: str) -> StreamMetrics:
+        stream = StreamMetrics(model=model.strip(), phase=phase)
+        self.streams.append(stream)
+        return stream
+
+    @property
+    def cancellations(self) -> int:
+        return sum(1 for stream in self.streams if stream.cancelled)
+
+    def as_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "duration": round(self.duration, 6),
+            "first_answer": self.first_answer,
+            "events": self.events,
+            "cancellations": self.cancellations,
+            "disconnected": self.disconnected,
+            "bytes": sum(stream.bytes for stream in self.streams),
+            "streams": [stream.as_dict() for stream in self.streams],
+        }
+
+    def summary(self) -> str:
+        parts = []
+        for stream in self.streams:
+            ttft = f"{stream.ttft:.2f}s" if stream.ttft is not None else "n/a"
+            part = (
+                f"{stream.model} {stream.phase}: ttft {ttft}, "
+                f"{stream.output_tokens} tok @ {stream.tokens_per_second:.1f} tok/s"
+            )
+            if stream.cancelled:
+                part += " (cancelled)"
+            parts.append(part)
+        parts.append(f"{self.events} events")
+        if self.disconnected:
+            parts.append("client disconnected")
+        return " | ".join(parts)
+
+
+# The metrics of the request being served. pipe() sets a fresh one, and the
+# tasks it starts inherit it along with the rest of the context.
+_request_metrics: ContextVar[RequestMetrics] = ContextVar("o1_request_metrics")
+
+
+class MetricsExporter:
+    """
+    Writes request metrics either as one JSON line per request or as a
+    Prometheus text exposition file with cumulative per model/phase series,
+    suitable for node_exporter's textfile collector.
+    """
+
+    def __init__(self):
+        self._totals = {}
+        self._requests = 0
+        self._events = 0
+        self._disconnects = 0
+        self._lock = threading.Lock()
+
+    def export(self, metrics: RequestMetrics, path: str, format: str):
+        with self._lock:
+            if format == "prometheus":
+                self._accumulate(metrics)
+                self._write_prometheus(path)
+            else:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(metrics.as_dict()) + "\n")
+
+    def _accumulate(self, metrics: RequestMetrics):
+        self._requests += 1
+        self._events += metrics.events
+        self._disconnects += int(metrics.disconnected)
+        for stream in metrics.streams:
+            totals = self._totals.setdefault(
+                (stream.model, stream.phase),
+                {
+                    "calls": 0,
+                    "tokens": 0,
+                    "prompt_tokens": 0,
+                    "bytes": 0,
+                    "cancellations": 0,
+                    "ttft_sum": 0.0,
+                    "ttft_count": 0,
+                    "queue_wait_sum": 0.0,
+                    "queue_wait_count": 0,
+                    "generation_seconds": 0.0,
+                },
+            )
+            totals["calls"] += 1
+            totals["tokens"] += stream.output_tokens
+            totals["prompt_tokens"] += stream.prompt_tokens or 0
+            totals["bytes"] += stream.bytes
+            totals["cancellations"] += int(stream.cancelled)
+            if stream.ttft is not None:
+                totals["ttft_sum"] += stream.ttft
+                totals["ttft_count"] += 1
+            if stream.queue_wait is not None:
+                totals["queue_wait_sum"] += stream.queue_wait
+                totals["queue_wait_count"] += 1
+            if stream.tokens_per_second > 0:
+                totals["generation_seconds"] += stream.output_tokens / stream.tokens_per_second
+
+    def _write_prometheus(self, path: str):
+        series = [
+            ("o1_pipe_model_calls_total", "counter", "Model calls.", "calls"),
+            ("o1_pipe_model_tokens_total", "counter", "Generated tokens.", "tokens"),
+            ("o1_pipe_model_prompt_tokens_total", "counter", "Prompt tokens processed.", "prompt_tokens"),
+            ("o1_pipe_model_bytes_total", "counter", "Bytes streamed from the backend.", "bytes"),
+            ("o1_pipe_model_cancellations_total", "counter", "Model calls cancelled before finishing.", "cancellations"),
+            ("o1_pipe_model_generation_seconds_total", "counter", "Seconds spent generating tokens.", "generation_seconds"),
+            ("o1_pipe_model_ttft_seconds_sum", "counter", "Sum of time to first token.", "ttft_sum"),
+            ("o1_pipe_model_ttft_seconds_count", "counter", "Calls with a first token.", "ttft_count"),
+            ("o1_pipe_model_queue_wait_seconds_sum", "counter", "Sum of time waiting for the backend to answer.", "queue_wait_sum"),
+            ("o1_pipe_model_queue_wait_seconds_count", "counter", "Calls with a measured queue wait.", "queue_wait_count"),
+        ]
+        lines = [
+            "# HELP o1_pipe_requests_total Chat requests served.",
+            "# TYPE o1_pipe_requests_total counter",
+            f"o1_pipe_requests_total {self._requests}",
+            "# HELP o1_pipe_events_total Events emitted to OpenWebUI.",
+            "# TYPE o1_pipe_events_total counter",
+            f"o1_pipe_events_total {self._events}",
+            "# HELP o1_pipe_client_disconnects_total Requests abandoned by the client mid-generation.",
+            "# TYPE o1_pipe_client_disconnects_total counter",
+            f"o1_pipe_client_disconnects_total {self._disconnects}",
+        ]
+        for name, kind, help_text, key in series:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (model, phase), totals in sorted(self._totals.items()):
+                model_label = model.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(
+                    f'{name}{{model="{model_label}",phase="{phase}"}} {totals[key]}'
+                )
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+
+class DirectResponse:
+    """
+    Streamed backend response with the same surface the pipe uses from the
+    OpenWebUI router responses: `body_iterator.read(n)` and `close()`.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.body_iterator = response.content
+
+    async def close(self):
+        # Fully read bodies hand the connection back to the pool, partially
+        # read ones are dropped so the backend stops generating
+        if self._response.content.at_eof():
+            self._response.release()
+        else:
+            self._response.close()
+
+
+class DirectBackendClient:
+    """
+    Shared aiohttp session used to call Ollama and OpenAI compatible backends
+    directly, keeping connections alive between requests and limiting the
+    number of open connections per backend.
+    """
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max(1, max_connections)
+        self._session = None
+        self._loop = None
+
+    def get_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.max_connections,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10),
+            )
+            self._loop = loop
+        return self._session
+
+    async def chat(self, url: str, payload: dict, headers: dict, stream: bool):
+        session = self.get_session()
+        response = await session.post(url, json=payload, headers=headers)
+        if response.status >= 400:
+            text = await response.text()
+            response.release()
+            raise RuntimeError(f"{url} returned {response.status}: {text[:200]}")
+        if stream:
+            return DirectResponse(response)
+        try:
+            return await response.json(content_type=None)
+        finally:
+            response.release()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
 class Pipe:
     class Valves(BaseModel):
         THINKING_MODEL: str = Field(
@@ -83,6 +756,22 @@ class Pipe:
             default=False,
             description="Off will use Ollama, On will use any OpenAI API",
         )
+        TASK_MODEL: str = Field(
+            default="",
+            description="Small fast model for background tasks like titles, tags and autocomplete. Empty uses the responding model.",
+        )
+        USE_OPENAI_API_TASK_MODEL: bool = Field(
+            default=False,
+            description="Off will use Ollama, On will use any OpenAI API",
+        )
+        TASK_CACHE_TTL: int = Field(
+            default=600,
+            description="Seconds a background task result is reused for the same conversation. 0 disables the task cache.",
+        )
+        TASK_CACHE_MAX_ENTRIES: int = Field(
+            default=512,
+            description="Maximum number of background task results kept in memory.",
+        )
         ENABLE_SHOW_THINKING_TRACE: bool = Field(
             default=False,
             description="Toggle show thinking trace.",
@@ -92,65 +781,278 @@ class Pipe:
             default=120,
             description="Maximum time in seconds that each thinking model is allowed to run for.",
         )
+        USE_DIRECT_BACKEND: bool = Field(
+            default=False,
+            description="Call Ollama/OpenAI directly through a shared pooled HTTP client instead of the OpenWebUI routers.",
+        )
+        OLLAMA_BASE_URL: str = Field(
+            default="http://localhost:11434",
+            description="Ollama server used by the direct backend client.",
+        )
+        OPENAI_BASE_URL: str = Field(
+            default="https://api.openai.com/v1",
+            description="OpenAI compatible API used by the direct backend client.",
+        )
+        OPENAI_API_KEY: str = Field(
+            default="",
+            description="API key sent by the direct backend client to the OpenAI compatible API.",
+        )
+        BACKEND_MAX_CONNECTIONS: int = Field(
+            default=16,
+            description="Maximum open connections per backend for the direct backend client.",
+        )
+        CANCEL_ON_DISCONNECT: bool = Field(
+            default=True,
+            description="Cancel every in-flight generation when the client disconnects or stops receiving events.",
+        )
+        DISCONNECT_POLL_INTERVAL: float = Field(
+            default=0.5,
+            description="Seconds between checks of whether the client is still connected.",
+        )
+        METRICS_EXPORT_PATH: str = Field(
+            default="",
+            description="File that per-request metrics are written to. Leave empty to disable exporting.",
+        )
+        METRICS_EXPORT_FORMAT: str = Field(
+            default="jsonl",
+            description="'jsonl' appends one line per request, 'prometheus' rewrites a text exposition file.",
+        )
+        ENABLE_DEBUG_METRICS_STATUS: bool = Field(
+            default=False,
+            description="Append per model time to first token and tokens/sec to the final status line.",
+        )
+        STREAM_READ_SIZE: int = Field(
+            default=16384,
+            description="Maximum bytes read from a streamed response body at a time.",
+        )
+        KEEP_ALIVE: str = Field(
+            default="30m",
+            description="How long Ollama keeps models loaded after a request, e.g. '30m' or '-1' for always. Empty uses the server default.",
+        )
+        ENABLE_MODEL_WARMUP: bool = Field(
+            default=False,
+            description="Preload the thinking and responding models in the background whenever the model valves change.",
+        )
+        ENABLE_REASONING_CACHE: bool = Field(
+            default=True,
+            description="Reuse thinking output for repeated questions in the same conversation context.",
+        )
+        REASONING_CACHE_TTL: int = Field(
+            default=3600,
+            description="Seconds a cached reasoning stays valid. 0 keeps entries until evicted.",
+        )
+        REASONING_CACHE_MAX_ENTRIES: int = Field(
+            default=256,
+            description="Maximum number of reasonings kept in the in-memory cache.",
+        )
+        REASONING_CACHE_DB_PATH: str = Field(
+            default="",
+            description="Optional SQLite file for a persistent cache tier. Leave empty for memory only.",
+        )
+        REASONING_CACHE_MAX_DB_ENTRIES: int = Field(
+            default=10000,
+            description="Maximum number of reasonings kept in the SQLite cache tier.",
+        )
+        ENABLE_PIPELINED_RESPONDING: bool = Field(
+            default=False,
+            description="Run thinking models concurrently and start responding once a quorum of reasonings is ready.",
+        )
+        PIPELINE_QUORUM: int = Field(
+            default=1,
+            description="Number of finished reasonings needed before responding starts in pipelined mode.",
+        )
+        PIPELINE_FOLD_GRACE: float = Field(
+            default=0.0,
+            description="Seconds to wait after the quorum for slower reasonings to fold in before the rest are cancelled.",
+        )
+        ENABLE_REASONING_COMPRESSION: bool = Field(
+            default=False,
+            description="Deduplicate and extract the key sentences of the reasonings locally before responding.",
+        )
+        REASONING_TOKEN_BUDGET: int = Field(
+            default=2000,
+            description="Estimated tokens of reasoning handed to the responder when compression is on. 0 only deduplicates.",
+        )
+        REASONING_DEDUP_THRESHOLD: float = Field(
+            default=0.8,
+            description="Word overlap (0-1) above which two reasoning sentences count as duplicates.",
+        )
+        CONTEXT_TOKEN_BUDGET: int = Field(
+            default=0,
+            description="Estimated token budget for the history sent to each model. 0 sends the full history.",
+        )
+        MODEL_CONTEXT_BUDGETS: str = Field(
+            default="",
+            description="Per-model overrides of the token budget, e.g. 'llama3:8b=6000,qwq=16000'.",
+        )
+        CONTEXT_TRIM_MODE: str = Field(
+            default="drop",
+            description="How older turns over budget are handled: 'drop' removes them, 'summarize' keeps a condensed note of them.",
+        )
 
     def __init__(self):
         self.type = "manifold"
         self.valves = self.Valves()
-        self.total_thinking_tokens = 0
-        self.max_thinking_time_reached = False
         self.__user__ = None
-        self._json_buffer = ""
+        self._reasoning_cache = None
+        self._reasoning_cache_config = None
+        self._task_cache = None
+        self._task_cache_config = None
+        self._inflight_tasks = {}
+        self.__request__ = None
+        self._warmup_fingerprint = None
+        self._warmup_task = None
+        self._direct_client = None
+        self._metrics_exporter = MetricsExporter()
+
+    @property
+    def metrics(self) -> RequestMetrics:
+        """Metrics of the request running in the current context."""
+        metrics = _request_metrics.get(None)
+        if metrics is None:
+            # Outside of pipe(), e.g. a warmup, nothing is exported
+            metrics = RequestMetrics()
+            _request_metrics.set(metrics)
+        return metrics
 
     def pipes(self):
+        if self.__request__ is not None:
+            self.schedule_warmup()
         name = "o1-"
         for model in self.valves.THINKING_MODEL.split(","):
             name += model.strip().split(":")[0] + "-"
         name = name[:-1] + "-to-" + self.valves.RESPONDING_MODEL.strip().split(":")[0]
         return [{"name": name, "id": name}]
 
-    def get_chunk_content(self, chunk: bytes):
+    def get_reasoning_cache(self) -> Optional[ResponseCache]:
         """
-        Accumulate chunk data in a buffer and extract complete JSON objects
-        from the buffer.
+        Return the reasoning cache for the current valves, rebuilding it when
+        the cache valves have changed since it was created.
         """
-        self._json_buffer += chunk.decode("utf-8")
+        if not self.valves.ENABLE_REASONING_CACHE:
+            return None
+        config = (
+            self.valves.REASONING_CACHE_MAX_ENTRIES,
+            self.valves.REASONING_CACHE_TTL,
+            self.valves.REASONING_CACHE_DB_PATH.strip(),
+            self.valves.REASONING_CACHE_MAX_DB_ENTRIES,
+        )
+        if self._reasoning_cache is None or self._reasoning_cache_config != config:
+            if self._reasoning_cache is not None:
+                self._reasoning_cache.close()
+            self._reasoning_cache = ResponseCache(*config)
+            self._reasoning_cache_config = config
+        return self._reasoning_cache
 
-        # Attempt to parse out valid JSON lines in a loop
-        while True:
-            # Each line might end with "\n", or the next JSON object
-            # might just start right after the prior one. So look for
-            # a new line or some other marker.
-            newline_index = self._json_buffer.find("\n")
-            if newline_index == -1:
-                # No complete line yet; wait for more data
+    def get_task_cache(self) -> Optional[ResponseCache]:
+        if self.valves.TASK_CACHE_TTL <= 0:
+            return None
+        config = (self.valves.TASK_CACHE_MAX_ENTRIES, self.valves.TASK_CACHE_TTL)
+        if self._task_cache is None or self._task_cache_config != config:
+            self._task_cache = ResponseCache(*config)
+            self._task_cache_config = config
+        return self._task_cache
+
+    @staticmethod
+    def estimate_tokens(content: Any) -> int:
+        """
+        Cheap local token estimate (about four characters per token) so the
+        history can be budgeted without loading a tokenizer.
+        """
+        if isinstance(content, str):
+            return (len(content) + 3) // 4
+        if isinstance(content, list):
+            total = 0
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    total += (len(part.get("text", "")) + 3) // 4
+                else:
+                    # Images and other attachments, rough flat cost
+                    total += 256
+            return total
+        return 0
+
+    def get_context_budget(self, model: str) -> int:
+        for entry in self.valves.MODEL_CONTEXT_BUDGETS.split(","):
+            name, sep, budget = entry.rpartition("=")
+            if sep and name.strip() == model.strip():
+                try:
+                    return int(budget)
+                except ValueError:
+                    logger.error(f'Invalid context budget "{entry}" for {model}')
+        return self.valves.CONTEXT_TOKEN_BUDGET
+
+    def build_context(
+        self, model: str, history: list, prompt: str, system_prompt: str = ""
+    ) -> list:
+        """
+        Assemble the message list for a model as a stable system prefix, the
+        prior history and the step prompt, trimming the oldest turns to fit
+        the model's token budget.
+
+        The returned list is new but the message dicts are shared with the
+        chat history, so they must never be mutated.
+        """
+        final_message = {"role": "user", "content": prompt}
+        prefix = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        budget = self.get_context_budget(model)
+        if budget <= 0:
+            return [*prefix, *history, final_message]
+
+        per_message = 4
+        system = prefix + [m for m in history if m.get("role") == "system"]
+        turns = [m for m in history if m.get("role") != "system"]
+        used = sum(self.estimate_tokens(m.get("content")) + per_message for m in system)
+        used += self.estimate_tokens(prompt) + per_message
+
+        kept = []
+        for message in reversed(turns):
+            cost = self.estimate_tokens(message.get("content")) + per_message
+            if used + cost > budget:
                 break
+            kept.append(message)
+            used += cost
+        kept.reverse()
 
-            line = self._json_buffer[:newline_index].strip()
-            self._json_buffer = self._json_buffer[newline_index + 1 :]
+        dropped = turns[: len(turns) - len(kept)]
+        if not dropped:
+            return [*system, *kept, final_message]
 
-            if not line:
-                continue
+        logger.debug(f"Trimmed {len(dropped)} older messages to fit {model} budget of {budget} tokens")
+        if self.valves.CONTEXT_TRIM_MODE.strip().lower() != "summarize":
+            return [*system, *kept, final_message]
 
-            try:
-                chunk_data = json.loads(line)
-                if "message" in chunk_data and "content" in chunk_data["message"]:
-                    yield chunk_data["message"]["content"]
-                if chunk_data.get("done", False):
-                    break
-            except json.JSONDecodeError as e:
-                logger.error(f'ChunkDecodeError: unable to parse "{line[:100]}": {e}')
-                # If we get a decode error, it likely means
-                # this line is incomplete or malformed. You can:
-                # 1. Keep a separate "incomplete_line" buffer and
-                #    re-append it to _json_buffer for the next iteration, or
-                # 2. Simply ignore malformed lines if you expect partial data.
-                #
-                # A simple approach is to re-append the line to the buffer:
-                self._json_buffer = line + "\n" + self._json_buffer
+        # Condense each dropped turn to its first sentence, newest first, in
+        # whatever budget is left over
+        lines = []
+        remaining = budget - used - per_message
+        for message in reversed(dropped):
+            content = message.get("content")
+            if not isinstance(content, str) or not content.strip():
+                continue
+            first = re.split(r"(?<=[.!?])\s+|\n", content.strip(), maxsplit=1)[0]
+            line = f"- {message.get('role', 'user')}: {first[:200]}"
+            cost = self.estimate_tokens(line) + 1
+            if cost > remaining:
                 break
+            lines.append(line)
+            remaining -= cost
+        if not lines:
+            return [*system, *kept, final_message]
+        lines.reverse()
+        summary = {
+            "role": "system",
+            "content": "Summary of earlier conversation:\n" + "\n".join(lines),
+        }
+        return [*system, summary, *kept, final_message]
 
     async def get_response(
-        self, model: str, messages: List[Dict[str, str]], thinking: bool, stream: bool
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        thinking: bool,
+        stream: bool,
+        use_openai_api: Optional[bool] = None,
     ):
         """
         Generate a response from the appropriate API based on the provided flags.
@@ -159,17 +1061,19 @@ class Pipe:
             model (str): The model ID to use for the API request.
             messages (List[Dict[str, str]]): The list of messages for the API to process.
             thinking (bool): Whether this is the 'thinking' phase or the 'responding' phase.
+            use_openai_api (bool, optional): Overrides the API picked from `thinking`.
 
         Returns:
             tuple: (response, api_source) where `response` is the API response object
                 and `api_source` is a string ('openai' or 'ollama') indicating the API used.
         """
         # Determine which API to use based on the `thinking` flag and the corresponding valve
-        use_openai_api = (
-            self.valves.USE_OPENAI_API_THINKING_MODEL
-            if thinking
-            else self.valves.USE_OPENAI_API_RESPONDING_MODEL
-        )
+        if use_openai_api is None:
+            use_openai_api = (
+                self.valves.USE_OPENAI_API_THINKING_MODEL
+                if thinking
+                else self.valves.USE_OPENAI_API_RESPONDING_MODEL
+            )
 
         # Select the appropriate API and identify the source
         if use_openai_api:
@@ -177,30 +1081,151 @@ class Pipe:
         else:
             generate_completion = ollama_chat_completion
 
+        payload = {"model": model, "messages": messages, "stream": stream}
+        keep_alive = self.get_keep_alive()
+        if not use_openai_api and keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        if use_openai_api and stream:
+            # Ask for a final usage chunk so token counts are exact
+            payload["stream_options"] = {"include_usage": True}
+
+        if self.valves.USE_DIRECT_BACKEND:
+            return await self.get_direct_response(payload, use_openai_api, stream)
+
         # Generate response
         response = await generate_completion(
             self.__request__,
-            {"model": model, "messages": messages, "stream": stream},
+            payload,
             user=self.__user__,
         )
 
         return response
 
+    def get_direct_client(self) -> DirectBackendClient:
+        if aiohttp is None:
+            raise RuntimeError("USE_DIRECT_BACKEND requires the aiohttp package")
+        max_connections = self.valves.BACKEND_MAX_CONNECTIONS
+        if (
+            self._direct_client is None
+            or self._direct_client.max_connections != max(1, max_connections)
+        ):
+            # The old session is left to be garbage collected, closing it here
+            # could cut off a stream that another request is still reading
+            self._direct_client = DirectBackendClient(max_connections)
+        return self._direct_client
+
+    async def get_direct_response(self, payload: dict, use_openai_api: bool, stream: bool):
+        client = self.get_direct_client()
+        if use_openai_api:
+            url = self.valves.OPENAI_BASE_URL.rstrip("/") + "/chat/completions"
+            headers = {}
+            if self.valves.OPENAI_API_KEY:
+                headers["Authorization"] = f"Bearer {self.valves.OPENAI_API_KEY}"
+        else:
+            url = self.valves.OLLAMA_BASE_URL.rstrip("/") + "/api/chat"
+            headers = {}
+        return await client.chat(url, payload, headers, stream)
+
+    async def close_response(self, response):
+        """
+        Release a backend response. Router responses are Starlette
+        StreamingResponses whose background task closes the upstream aiohttp
+        session, so it is run right away rather than never.
+        """
+        if not response:
+            return
+        try:
+            if hasattr(response, "close"):
+                await response.close()
+            elif getattr(response, "background", None) is not None:
+                background = response.background
+                response.background = None
+                await background()
+        except Exception as e:
+            logger.error(f"Failed to close backend response: {e}")
+
+    def get_keep_alive(self):
+        keep_alive = self.valves.KEEP_ALIVE.strip()
+        if not keep_alive:
+            return None
+        # Ollama takes either a duration string or a number of seconds
+        if keep_alive.lstrip("-").isdigit():
+            return int(keep_alive)
+        return keep_alive
+
+    def schedule_warmup(self):
+        """
+        Start a background preload of the configured models if the model
+        valves changed since the last warmup.
+        """
+        if not self.valves.ENABLE_MODEL_WARMUP:
+            return
+        fingerprint = (
+            self.valves.THINKING_MODEL,
+            self.valves.USE_OPENAI_API_THINKING_MODEL,
+            self.valves.RESPONDING_MODEL,
+            self.valves.USE_OPENAI_API_RESPONDING_MODEL,
+            self.valves.TASK_MODEL,
+            self.valves.USE_OPENAI_API_TASK_MODEL,
+            self.valves.KEEP_ALIVE,
+        )
+        if fingerprint == self._warmup_fingerprint:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._warmup_fingerprint = fingerprint
+        self._warmup_task = loop.create_task(self.warmup_models())
+
+    async def warmup_models(self):
+        """
+        Load every Ollama-served thinking, responding and task model with an
+        empty chat request, which Ollama treats as a preload.
+        """
+        targets = []
+        if not self.valves.USE_OPENAI_API_THINKING_MODEL:
+            targets += [m.strip() for m in self.valves.THINKING_MODEL.split(",")]
+        if not self.valves.USE_OPENAI_API_RESPONDING_MODEL:
+            targets.append(self.valves.RESPONDING_MODEL.strip())
+        if self.valves.TASK_MODEL.strip() and not self.valves.USE_OPENAI_API_TASK_MODEL:
+            targets.append(self.valves.TASK_MODEL.strip())
+
+        for model in dict.fromkeys(targets):
+            response = None
+            try:
+                tik = time()
+                response = await self.get_response(model, [], False, False, False)
+                logger.info(f"Preloaded {model} in {time() - tik:.2f}s")
+            except Exception as e:
+                logger.error(f"Warmup of {model} failed: {e}")
+            finally:
+                await self.close_response(response)
+
     async def get_completion(
         self,
         model: str,
         messages: list,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+        use_openai_api: Optional[bool] = None,
     ):
         response = None
+        metrics = self.metrics.start_stream(model, "task")
         try:
             thinking = False
             stream = False
-            response = await self.get_response(model, messages, thinking, stream)
+            response = await self.get_response(
+                model, messages, thinking, stream, use_openai_api
+            )
+            metrics.duration = perf_counter() - metrics.started
+            metrics.queue_wait = metrics.ttft = metrics.duration
 
             if not response:
                 return "**No content available**"
 
+            if isinstance(response, dict):
+                metrics.record_usage(response.get("usage") or response)
+
             # --- Handle old format (OpenAI style: { "choices": [ { "message": {...} } ] })
             if "choices" in response:
                 if not response["choices"]:
@@ -219,8 +1244,7 @@ class Pipe:
                 f"Error: Is {model} a valid model? ({e})", __event_emitter__
             )
         finally:
-            if response and hasattr(response, "close"):
-                await response.close()
+            await self.close_response(response)
 
     async def stream_response(
         self,
@@ -228,17 +1252,31 @@ class Pipe:
         messages: List[Dict[str, str]],
         thinking: bool,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+        metrics: Optional[StreamMetrics] = None,
     ) -> AsyncGenerator[str, None]:
 
         start_thought_time = time()
+        time_limit_hit = False
+        response = None
+        decoder = ChunkDecoder()
+        if metrics is None:
+            metrics = self.metrics.start_stream(
+                model, "thinking" if thinking else "responding"
+            )
         try:
             stream = True
             response = await self.get_response(model, messages, thinking, stream)
-            while True:
-                chunk = await response.body_iterator.read(1024)
+            metrics.queue_wait = perf_counter() - metrics.started
+            while not decoder.done:
+                chunk = await response.body_iterator.read(
+                    max(1024, self.valves.STREAM_READ_SIZE)
+                )
                 if not chunk:  # No more data
                     break
-                for part in self.get_chunk_content(chunk):
+                for part in decoder.feed(chunk):
+                    if metrics.ttft is None and part:
+                        metrics.ttft = perf_counter() - metrics.started
+                    metrics.chunks += 1
                     yield part
 
                 if thinking:
@@ -251,13 +1289,13 @@ class Pipe:
                         logger.info(
                             f'Max thinking Time reached in stream_response of thinking model "'
                         )
-                        self.max_thinking_time_reached = True
+                        self.metrics.max_thinking_time_reached = True
+                        time_limit_hit = True
                         break
 
-            # Force-close the stream after breaking:
-            if self.max_thinking_time_reached:
-                await response.close()
-                return
+            # A stream cut at the time limit is closed by the finally below
+            if not time_limit_hit:
+                metrics.complete = decoder.done
 
         except Exception as e:
             if thinking:
@@ -276,10 +1314,15 @@ class Pipe:
                 f"{category} Error: ensure {model} is a valid model option in the {api} api {e}",
                 __event_emitter__,
             )
+        except (asyncio.CancelledError, GeneratorExit):
+            metrics.cancelled = True
+            raise
         finally:
+            metrics.duration = perf_counter() - metrics.started
+            metrics.bytes = decoder.bytes
+            metrics.record_usage(decoder.usage)
             # Always close if response is still open
-            if response and hasattr(response, "close"):
-                await response.close()
+            await self.close_response(response)
 
     async def run_step(
         self,
@@ -290,29 +1333,62 @@ class Pipe:
         step_name: str,
         title_name: str,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+        stream_output: bool = True,
+        system_prompt: str = "",
+        metrics: Optional[StreamMetrics] = None,
     ) -> str:
-        messages = json.loads(json.dumps(messages))
-        messages[-1] = {
-            "role": "user",
-            "content": prompt,
-        }
+        """
+        Run one model over the history with `prompt` as the last user message
+        and `system_prompt` as a stable leading system message.
 
-        await self.send_data("\n### " + title_name + "\n", thinking, __event_emitter__)
+        With `stream_output` off the output is sent as a single block once the
+        step finishes, which keeps concurrent steps from interleaving. Pass
+        `metrics` to find out afterwards how the stream ended.
+        """
+        # The last message is replaced by the step prompt, the rest of the
+        # history is shared rather than copied
+        messages = self.build_context(model, messages[:-1], prompt, system_prompt)
 
-        response_text = ""
+        if stream_output:
+            await self.send_data(
+                "\n### " + title_name + "\n", thinking, __event_emitter__
+            )
+
+        response_parts = []
         num_tokens = 0
-        async for chunk in self.stream_response(
-            model.strip(), messages, thinking, __event_emitter__
-        ):
-            response_text += chunk
-            num_tokens += 1
-            await self.send_data(chunk, thinking, __event_emitter__)
-            await self.set_status(
-                f"{step_name} ({num_tokens} tokens)", __event_emitter__
+        if metrics is None:
+            metrics = self.metrics.start_stream(
+                model, "thinking" if thinking else "responding"
             )
+        stream = self.stream_response(
+            model.strip(), messages, thinking, __event_emitter__, metrics
+        )
+        try:
+            async for chunk in stream:
+                response_parts.append(chunk)
+                num_tokens += 1
+                if stream_output:
+                    await self.send_data(chunk, thinking, __event_emitter__)
+                    if not thinking and self.metrics.first_answer_time is None:
+                        self.metrics.first_answer_time = time()
+                await self.set_status(
+                    f"{step_name} ({num_tokens} tokens)", __event_emitter__
+                )
+        finally:
+            # Close the upstream stream now if we stopped early, e.g. the
+            # client went away, instead of whenever the generator is collected
+            await stream.aclose()
         if thinking:
-            self.total_thinking_tokens += num_tokens
-        return response_text.strip()
+            # Prefer the backend's own count, stream chunks are only an estimate
+            self.metrics.thinking_tokens += metrics.output_tokens
+        response_text = "".join(response_parts).strip()
+        if not stream_output and response_text:
+            await self.send_data(
+                "\n### " + title_name + "\n" + response_text + "\n",
+                thinking,
+                __event_emitter__,
+            )
+        return response_text
 
     async def run_thinking(
         self,
@@ -322,22 +1398,40 @@ class Pipe:
         messages: list,
         query: str,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+        stream_output: bool = True,
     ) -> str:
-        # Deep copy the messages to avoid changing the original
         thinking_with = ""
         if n == 1:
             thinking_with = f"with {model}"
         else:
             thinking_with = f"with {model} {k}/{n}"
 
-        prompt = "You are a reasoning model.\n"
-        prompt += "Think carefully about the user's request and output your reasoning steps.\n"
-        prompt += (
-            "Do not answer the user directly, just produce a hidden reasoning chain.\n"
-        )
-        prompt += "First rephrase the user prompt, then answer using multiple thinking-path to give all possible answers.\n"
-        prompt += f"User Query: {query}"
+        # The query is sent exactly as the user wrote it so the whole
+        # conversation, including this turn, is a reusable prefix next turn
+        prompt = query
 
+        cache = self.get_reasoning_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = ResponseCache.make_key(model, query, messages[:-1])
+            try:
+                cached = await asyncio.to_thread(cache.get, cache_key)
+            except Exception as e:
+                logger.error(f"Reasoning cache lookup failed: {e}")
+                cached = None
+            if cached is not None:
+                self.metrics.cache_hits += 1
+                await self.send_data(
+                    f"\n### `{model}` thoughts (cached)\n", True, __event_emitter__
+                )
+                await self.send_data(cached, True, __event_emitter__)
+                await self.set_status(
+                    f"Reused cached reasoning {thinking_with}", __event_emitter__
+                )
+                return cached
+            self.metrics.cache_misses += 1
+
+        metrics = self.metrics.start_stream(model, "thinking")
         reasoning = await self.run_step(
             model,
             messages,
@@ -346,11 +1440,20 @@ class Pipe:
             f"Thinking {thinking_with}",
             f"`{model}` thoughts",
             __event_emitter__,
+            stream_output,
+            THINKING_SYSTEM_PROMPT,
+            metrics,
         )
 
-        await self.set_status(f"Finished thinking {thinking_with}", __event_emitter__)
+        # Only cache complete reasonings, a chain truncated by the time limit
+        # or a failed stream would be replayed for the whole TTL
+        if cache_key is not None and reasoning and metrics.complete:
+            try:
+                await asyncio.to_thread(cache.put, cache_key, reasoning)
+            except Exception as e:
+                logger.error(f"Reasoning cache store failed: {e}")
 
-        await asyncio.sleep(0.2)
+        await self.set_status(f"Finished thinking {thinking_with}", __event_emitter__)
         return reasoning
 
     async def run_responding(
@@ -363,12 +1466,18 @@ class Pipe:
     ) -> str:
         await self.set_status("Formulating response...", __event_emitter__)
 
-        prompt = "Here is some internal reasoning to guide your response:\n"
-        prompt += f"<reasoning>{reasonings[0]}<reasoning-end>\n"
-        for reasoning in reasonings[1:]:
-            prompt += "Here is some other internal reasoning to guide your response:\n"
+        if self.valves.ENABLE_REASONING_COMPRESSION and reasonings:
+            reasonings = await self.compress_reasonings(reasonings)
+
+        # Query first, reasonings after it, so only the tail of the prompt
+        # differs from what the backend has already processed
+        prompt = f"{query}\n\n"
+        for i, reasoning in enumerate(reasonings):
+            if i == 0:
+                prompt += "Here is some internal reasoning to guide your response:\n"
+            else:
+                prompt += "Here is some other internal reasoning to guide your response:\n"
             prompt += f"<reasoning>{reasoning}<reasoning-end>\n"
-        prompt += f"Use this reasoning to respond in concise and helpful manner to the user's query: {query}"
 
         response_text = await self.run_step(
             self.valves.RESPONDING_MODEL.strip(),
@@ -378,11 +1487,49 @@ class Pipe:
             "Generating response",
             "Response",
             __event_emitter__,
+            True,
+            RESPONDING_SYSTEM_PROMPT,
         )
-
-        await asyncio.sleep(0.2)
         return response_text
 
+    async def compress_reasonings(self, reasonings: list) -> list:
+        compressor = ReasoningCompressor(
+            self.valves.REASONING_TOKEN_BUDGET, self.valves.REASONING_DEDUP_THRESHOLD
+        )
+        tik = perf_counter()
+        try:
+            compressed = await asyncio.to_thread(compressor.compress, reasonings)
+        except Exception as e:
+            logger.error(f"Reasoning compression failed: {e}")
+            return reasonings
+        before = sum(compressor.estimate_tokens(r) for r in reasonings)
+        after = sum(compressor.estimate_tokens(r) for r in compressed)
+        self.metrics.compression_stats = (before, after, perf_counter() - tik)
+        logger.debug(
+            f"Compressed reasonings from ~{before} to ~{after} tokens in {self.metrics.compression_stats[2]:.3f}s"
+        )
+        return compressed
+
+    def compression_summary(self) -> str:
+        before, after, elapsed = self.metrics.compression_stats
+        summary = f"reasoning compressed ~{before}->{after} tokens"
+        if after:
+            summary += f" ({before / after:.1f}x)"
+        # Price the removed tokens at the responder's measured prompt speed
+        responder = next(
+            (
+                m
+                for m in reversed(self.metrics.streams)
+                if m.phase == "responding" and m.prompt_tokens and m.prompt_eval_seconds
+            ),
+            None,
+        )
+        if responder is not None:
+            rate = responder.prompt_tokens / responder.prompt_eval_seconds
+            saved = (before - after) / rate - elapsed
+            summary += f", ~{saved:.1f}s prompt time saved"
+        return summary
+
     async def run_thinking_pipeline(
         self,
         k: int,
@@ -390,9 +1537,16 @@ class Pipe:
         messages: list,
         query: str,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+        stream_output: bool = True,
     ) -> str:
         response = await self.run_thinking(
-            k + 1, len(models), models[k], messages, query, __event_emitter__
+            k + 1,
+            len(models),
+            models[k],
+            messages,
+            query,
+            __event_emitter__,
+            stream_output,
         )
 
         # If you want to implement some custom logic after the initial thoughts, you can do so here
@@ -400,6 +1554,71 @@ class Pipe:
 
         return response
 
+    async def run_thinking_pipelined(
+        self,
+        models: list,
+        messages: list,
+        query: str,
+        __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> list:
+        """
+        Run every thinking model concurrently and return as soon as
+        PIPELINE_QUORUM reasonings are ready. Reasonings that finish within
+        PIPELINE_FOLD_GRACE seconds after that are folded in, the rest are
+        cancelled. Results keep the configured model order.
+        """
+        tasks = [
+            asyncio.create_task(
+                self.run_thinking_pipeline(
+                    k, models, messages, query, __event_emitter__, False
+                )
+            )
+            for k in range(len(models))
+        ]
+        order = {task: k for k, task in enumerate(tasks)}
+        quorum = min(max(1, self.valves.PIPELINE_QUORUM), len(tasks))
+        results = {}
+        pending = set(tasks)
+
+        def collect(done):
+            disconnected = None
+            for task in done:
+                if task.cancelled():
+                    continue
+                error = task.exception()
+                if isinstance(error, ClientDisconnected):
+                    disconnected = error
+                    continue
+                if error is not None:
+                    logger.error(f"Thinking task failed: {error}")
+                    continue
+                if task.result():
+                    results[order[task]] = task.result()
+            if disconnected is not None:
+                raise disconnected
+
+        try:
+            while pending and len(results) < quorum:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                collect(done)
+
+            if pending and self.valves.PIPELINE_FOLD_GRACE > 0:
+                done, pending = await asyncio.wait(
+                    pending, timeout=self.valves.PIPELINE_FOLD_GRACE
+                )
+                collect(done)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                self.metrics.cancelled_reasonings += len(pending)
+                logger.info(f"Cancelled {len(pending)} thinking models after quorum")
+
+        return [results[k] for k in sorted(results)]
+
     async def pipe(
         self,
         body: dict,
@@ -409,60 +1628,212 @@ class Pipe:
         __task__=None,
     ) -> str:
 
-        print(__event_emitter__)
         # Get relavant info
         # Filter __user__ dictionary to only include keys expected by User class
         user_data = {k: v for k, v in __user__.items() if k in ['id', 'email', 'name', 'role']}
         self.__user__ = User(**user_data)
         self.__request__ = __request__
+        self.schedule_warmup()
+        metrics = RequestMetrics()
+        _request_metrics.set(metrics)
         messages = body["messages"]
         query = get_last_user_message(messages)
 
         if (
             __task__ == None
         ):  # only perform thinking when not a defined task like title generation
-            # Run the "thinking" step
-            # Clone the messages to avoid changing the original
-            tik = time()
-            models = self.valves.THINKING_MODEL.split(",")
+            try:
+                return await self.run_until_disconnected(
+                    self.run_chain(messages, query, __event_emitter__), __request__
+                )
+            finally:
+                if metrics.first_answer_time is not None:
+                    metrics.first_answer = metrics.first_answer_time - metrics.timestamp
+                await self.export_metrics()
+        else:
+            # avoid thinking and just return a regular response or named task, like tags
+            try:
+                return await self.run_until_disconnected(
+                    self.run_task(str(__task__), messages, __event_emitter__),
+                    __request__,
+                )
+            finally:
+                await self.export_metrics()
+
+    async def run_chain(
+        self,
+        messages: list,
+        query: str,
+        __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> str:
+        # Run the "thinking" step
+        # Clone the messages to avoid changing the original
+        tik = time()
+        metrics = self.metrics
+        models = self.valves.THINKING_MODEL.split(",")
+        if self.valves.ENABLE_PIPELINED_RESPONDING:
+            reasonings = await self.run_thinking_pipelined(
+                models, messages, query, __event_emitter__
+            )
+        else:
             reasonings = [
                 await self.run_thinking_pipeline(
                     model, models, messages, query, __event_emitter__
                 )
                 for model in range(len(models))
             ]
-            total_thought_duration = int(time() - tik)
+        total_thought_duration = int(time() - tik)
+
+        # Run the "responding" step using the reasoning
+        await self.run_responding(
+            messages, query, reasonings, True, __event_emitter__
+        )
 
-            # Run the "responding" step using the reasoning
-            await self.run_responding(
-                messages, query, reasonings, True, __event_emitter__
+        details = []
+        if metrics.first_answer_time is not None:
+            time_to_answer = metrics.first_answer_time - metrics.timestamp
+            details.append(f"first answer after {time_to_answer:.1f}s")
+            logger.info(f"Time to first visible answer: {time_to_answer:.3f}s")
+        if metrics.cancelled_reasonings:
+            details.append(f"{metrics.cancelled_reasonings} reasonings cancelled")
+        if self.valves.ENABLE_REASONING_CACHE:
+            details.append(
+                f"reasoning cache: {metrics.cache_hits} hits, {metrics.cache_misses} misses"
             )
+        if metrics.compression_stats is not None:
+            details.append(self.compression_summary())
+        if self.valves.ENABLE_DEBUG_METRICS_STATUS:
+            details.append(metrics.summary())
+        status_details = f" ({', '.join(details)})" if details else ""
 
-            if self.max_thinking_time_reached:
-                await self.set_status_end(
-                    f"Thought for {self.total_thinking_tokens} tokens in max allowed time of {total_thought_duration} seconds",
-                    __event_emitter__,
-                )
-            else:
-                await self.set_status_end(
-                    f"Thought for only {self.total_thinking_tokens} tokens in {total_thought_duration} seconds",
-                    __event_emitter__,
-                )
+        if metrics.max_thinking_time_reached:
+            await self.set_status_end(
+                f"Thought for {metrics.thinking_tokens} tokens in max allowed time of {total_thought_duration} seconds{status_details}",
+                __event_emitter__,
+            )
+        else:
+            await self.set_status_end(
+                f"Thought for only {metrics.thinking_tokens} tokens in {total_thought_duration} seconds{status_details}",
+                __event_emitter__,
+            )
+        return ""
+
+    async def run_until_disconnected(self, work: Awaitable, __request__: Request):
+        """
+        Await `work` while watching for the client going away, either the
+        request disconnecting or the event emitter failing. When that happens
+        the work is cancelled, which closes every upstream stream it has open.
+        """
+        work = asyncio.ensure_future(work)
+        watcher = None
+        if (
+            self.valves.CANCEL_ON_DISCONNECT
+            and __request__ is not None
+            and hasattr(__request__, "is_disconnected")
+        ):
+            try:
+                # When OpenWebUI runs the chat as a background task the HTTP
+                # request is already finished, so it says nothing about the user
+                detached = await __request__.is_disconnected()
+            except Exception:
+                detached = True
+            if not detached:
+                watcher = asyncio.ensure_future(self.watch_disconnect(__request__))
+
+        try:
+            if watcher is None:
+                return await work
+            done, _ = await asyncio.wait(
+                {work, watcher}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if work in done:
+                return work.result()
+            raise ClientDisconnected("request disconnected")
+        except ClientDisconnected as e:
+            self.metrics.disconnected = True
+            logger.info(f"Client went away ({e}), cancelling upstream generations")
             return ""
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if not work.done():
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+            if self.metrics.cancellations:
+                logger.info(f"Cancelled {self.metrics.cancellations} model streams")
+
+    async def watch_disconnect(self, __request__: Request):
+        interval = max(0.05, self.valves.DISCONNECT_POLL_INTERVAL)
+        while True:
+            try:
+                if await __request__.is_disconnected():
+                    return
+            except Exception:
+                return
+            await asyncio.sleep(interval)
+
+    async def run_task(
+        self,
+        task: str,
+        messages: list,
+        __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ):
+        """
+        Run a background task (title, tags, autocomplete...) on TASK_MODEL.
+        Results are cached per conversation and identical requests that arrive
+        while one is already running share its result.
+        """
+        if self.valves.TASK_MODEL.strip():
+            model = self.valves.TASK_MODEL.strip()
+            use_openai_api = self.valves.USE_OPENAI_API_TASK_MODEL
         else:
-            # avoid thinking and just return a regular response or named task, like tags
-            message = await self.get_completion(
-                self.valves.RESPONDING_MODEL.strip(), messages, __event_emitter__
+            model = self.valves.RESPONDING_MODEL.strip()
+            use_openai_api = self.valves.USE_OPENAI_API_RESPONDING_MODEL
+
+        cache = self.get_task_cache()
+        key = ResponseCache.make_task_key(task, model, messages)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        inflight = self._inflight_tasks.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                self.get_completion(model, messages, __event_emitter__, use_openai_api)
             )
-            return message
+            self._inflight_tasks[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight_tasks.pop(key, None))
+        else:
+            logger.debug(f"Coalesced {task} request onto one already running")
+
+        # Shielded so one caller going away does not cancel the others' result
+        message = await asyncio.shield(inflight)
+        if cache is not None and message and message != "**No content available**":
+            cache.put(key, message)
+        return message
+
+    async def export_metrics(self):
+        self.metrics.duration = perf_counter() - self.metrics.started
+        path = self.valves.METRICS_EXPORT_PATH.strip()
+        if not path:
+            return
+        format = self.valves.METRICS_EXPORT_FORMAT.strip().lower()
+        try:
+            await asyncio.to_thread(
+                self._metrics_exporter.export, self.metrics, path, format
+            )
+        except Exception as e:
+            logger.error(f"Failed to export metrics to {path}: {e}")
 
     async def set_status(
         self,
         description: str,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
     ):
-        await __event_emitter__(
-            {"type": "status", "data": {"description": description, "done": False}}
+        await self.emit(
+            {"type": "status", "data": {"description": description, "done": False}},
+            __event_emitter__,
         )
 
     async def send_data(
@@ -472,14 +1843,15 @@ class Pipe:
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
     ):
         if not thinking or self.valves.ENABLE_SHOW_THINKING_TRACE:
-            await __event_emitter__(
+            await self.emit(
                 {
                     "type": "message",
                     "data": {
                         "content": data,
                         "role": "assistant-thinking" if thinking else "assistant",
                     },
-                }
+                },
+                __event_emitter__,
             )
 
     async def set_status_end(
@@ -487,6 +1859,20 @@ class Pipe:
         data: str,
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
     ):
-        await __event_emitter__(
-            {"type": "status", "data": {"description": data, "done": True}}
+        await self.emit(
+            {"type": "status", "data": {"description": data, "done": True}},
+            __event_emitter__,
         )
+
+    async def emit(
+        self,
+        event: dict,
+        __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ):
+        self.metrics.events += 1
+        try:
+            await __event_emitter__(event)
+        except Exception as e:
+            if self.valves.CANCEL_ON_DISCONNECT:
+                raise ClientDisconnected(f"event emitter failed: {e}") from e
+            raise
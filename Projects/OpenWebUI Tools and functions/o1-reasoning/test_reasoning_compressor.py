@@ -0,0 +1,66 @@
+"""
+Tests for the ReasoningCompressor that shrinks reasoning traces for the
+responding model. Loads o1-function.py with the same open_webui stubs as the
+benchmark, so OpenWebUI itself is not needed.
+
+Usage:
+    python -m pytest test_reasoning_compressor.py
+    python -m unittest test_reasoning_compressor
+"""
+
+import unittest
+
+from bench_backend import load_pipe_module
+
+o1 = load_pipe_module()
+ReasoningCompressor = o1.ReasoningCompressor
+
+
+def tokens(traces) -> int:
+    return sum(ReasoningCompressor.estimate_tokens(trace) for trace in traces)
+
+
+class ReasoningCompressorTest(unittest.TestCase):
+    def test_within_budget_keeps_everything(self):
+        traces = ["First we add the numbers. Then we check the sum.", "The sum is 12."]
+        self.assertEqual(ReasoningCompressor(1000).compress(traces),
+                         ["First we add the numbers.\nThen we check the sum.", "The sum is 12."])
+
+    def test_drops_repeated_sentences(self):
+        traces = ["The answer is 42. It follows from the input.", "The answer is 42. Nothing else matters."]
+        compressed = ReasoningCompressor(1000).compress(traces)
+        self.assertEqual(" ".join(compressed).count("The answer is 42."), 1)
+
+    def test_selects_within_budget(self):
+        traces = [" ".join(f"Step {i} checks the value of x against y." for i in range(40))]
+        compressed = ReasoningCompressor(50).compress(traces)
+        self.assertTrue(compressed)
+        self.assertLessEqual(tokens(compressed), 50)
+
+    def test_trace_without_punctuation_is_cut_not_dropped(self):
+        # One long sentence, larger than the whole budget
+        trace = " ".join(["the model keeps thinking about the problem"] * 7)
+        self.assertGreater(ReasoningCompressor.estimate_tokens(trace), 20)
+        compressed = ReasoningCompressor(20).compress([trace])
+        self.assertEqual(len(compressed), 1)
+        self.assertTrue(compressed[0])
+        self.assertLessEqual(tokens(compressed), 20)
+        self.assertTrue(trace.startswith(compressed[0]))
+        # Cut at a word boundary
+        self.assertEqual(trace[len(compressed[0])], " ")
+
+    def test_single_word_larger_than_budget(self):
+        compressed = ReasoningCompressor(2).compress(["x" * 100])
+        self.assertEqual(compressed, ["x" * 8])
+
+    def test_never_empty_for_non_empty_input(self):
+        traces = ["a" * 400, "b c d e f g h i j k l m n o p q r s t u v w x y z " * 20]
+        for budget in (1, 5, 20, 100):
+            with self.subTest(budget=budget):
+                compressed = ReasoningCompressor(budget).compress(traces)
+                self.assertTrue(any(compressed))
+                self.assertLessEqual(tokens(compressed), budget)
+
+
+if __name__ == "__main__":
+    unittest.main()